@@ -0,0 +1,106 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from cachetools import TTLCache
+
+
+def normalizar_filtro(valor: Optional[str]) -> Optional[str]:
+    """
+    Normaliza um filtro de texto para compor a chave do cache. Filtros vazios equivalem a
+    nenhum filtro e a busca não diferencia maiúsculas.
+    """
+    if not valor:
+        return None
+    return valor.lower()
+
+
+class _TTLCacheContado(TTLCache):
+    """TTLCache que conta remoções por capacidade (LRU) e por expiração"""
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.evictions = 0
+        self.expirados = 0
+        self._limpando = False
+
+    def popitem(self):
+        # Chamado pelo cachetools quando o cache está cheio (e por clear(), que não conta)
+        item = super().popitem()
+        if not self._limpando:
+            self.evictions += 1
+        return item
+
+    def clear(self):
+        self._limpando = True
+        try:
+            super().clear()
+        finally:
+            self._limpando = False
+
+    def expire(self, time=None):
+        removidos = super().expire(time)
+        self.expirados += len(removidos)
+        return removidos
+
+
+class CacheResultados:
+    """
+    Cache LRU com TTL para respostas da API, invalidado a cada nova versão do banco.
+
+    As entradas valem apenas para a versão do banco com que foram calculadas: quando uma versão
+    diferente aparece, o cache inteiro é descartado.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = _TTLCacheContado(maxsize, ttl)
+        self._versao = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+
+    def obter(self, chave: Hashable, versao: Hashable, calcular: Callable[[], Any]) -> Any:
+        """Retorna o valor em cache para `chave`, calculando-o (fora do lock) se necessário"""
+        with self._lock:
+            if versao != self._versao:
+                if self._versao is not None:
+                    self.invalidacoes += 1
+                self._cache.clear()
+                self._versao = versao
+
+            try:
+                valor = self._cache[chave]
+                self.hits += 1
+                return valor
+            except KeyError:
+                self.misses += 1
+
+        valor = calcular()
+
+        with self._lock:
+            # Não guardar resultado de uma versão que já foi substituída durante o cálculo
+            if versao == self._versao:
+                self._cache[chave] = valor
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            self._cache.expire()
+            consultas = self.hits + self.misses
+            return {
+                "tamanho": len(self._cache),
+                "capacidade": self.maxsize,
+                "ttl_segundos": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self._cache.evictions,
+                "expirados": self._cache.expirados,
+                "invalidacoes": self.invalidacoes,
+                "taxa_acerto": round(self.hits / consultas, 4) if consultas else 0.0,
+            }
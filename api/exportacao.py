@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+from typing import Iterator, Optional, Sequence
+
+import pyarrow as pa
+
+from .serializacao import dumps_json
+
+# Linhas lidas do cursor por vez: a memória usada não depende do tamanho da exportação
+TAMANHO_LOTE = 5000
+
+COLUNAS_EXPORTACAO = ["mes_ano", "credor", "status_titulo", "quantidade", "valor_total", "valor_medio"]
+
+SCHEMA_EXPORTACAO = pa.schema([
+    ("mes_ano", pa.string()),
+    ("credor", pa.string()),
+    ("status_titulo", pa.string()),
+    ("quantidade", pa.int64()),
+    ("valor_total", pa.float64()),
+    ("valor_medio", pa.float64()),
+])
+
+# Formato -> (media type, extensão do arquivo)
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def montar_consulta(
+        credores: Optional[Sequence[str]] = None,
+        status: Optional[Sequence[str]] = None,
+        mes_ano: Optional[str] = None
+):
+    """
+    SELECT de exportação. `credores` e `status` são listas de valores exatos (já resolvidos pelo
+    índice de busca), passadas como um único parâmetro JSON para não esbarrar no limite de
+    variáveis do SQLite.
+    """
+    query = """
+    SELECT MES_ANO, CREDOR, STATUS_TITULO, QUANTIDADE, VALOR_TOTAL, VALOR_MEDIO
+    FROM resumo_mensal WHERE 1=1
+    """
+    params = []
+
+    if credores is not None:
+        query += " AND CREDOR IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(credores)))
+
+    if status is not None:
+        query += " AND STATUS_TITULO IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(list(status)))
+
+    if mes_ano:
+        query += " AND MES_ANO = ?"
+        params.append(mes_ano)
+
+    query += " ORDER BY MES_ANO, CREDOR, STATUS_TITULO"
+    return query, params
+
+
+def _lotes(cursor) -> Iterator[list]:
+    while True:
+        linhas = cursor.fetchmany(TAMANHO_LOTE)
+        if not linhas:
+            return
+        yield [tuple(linha) for linha in linhas]
+
+
+def gerar_csv(cursor) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(COLUNAS_EXPORTACAO)
+
+    for linhas in _lotes(cursor):
+        escritor.writerows(linhas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Só o cabeçalho, quando nenhuma linha atende aos filtros
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gerar_ndjson(cursor) -> Iterator[bytes]:
+    for linhas in _lotes(cursor):
+        yield b"".join(dumps_json(dict(zip(COLUNAS_EXPORTACAO, linha))) + b"\n" for linha in linhas)
+
+
+def gerar_arrow(cursor) -> Iterator[bytes]:
+    """Stream IPC do Arrow: o schema e depois um record batch por lote"""
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, SCHEMA_EXPORTACAO) as writer:
+        for linhas in _lotes(cursor):
+            colunas = list(zip(*linhas))
+            writer.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, SCHEMA_EXPORTACAO)],
+                schema=SCHEMA_EXPORTACAO
+            ))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # Schema (se não houve lotes) e marcador de fim do stream
+    yield sink.getvalue()
+
+
+GERADORES = {
+    "csv": gerar_csv,
+    "ndjson": gerar_ndjson,
+    "arrow": gerar_arrow,
+}
+
+
+def exportar(conn, formato: str, credores=None, status=None, mes_ano=None) -> Iterator[bytes]:
+    """
+    Gera os bytes da exportação em partes, lendo `conn` em lotes, e fecha a conexão ao final
+    (ou quando o gerador é descartado).
+    """
+    try:
+        query, params = montar_consulta(credores, status, mes_ano)
+        yield from GERADORES[formato](conn.execute(query, params))
+    finally:
+        conn.close()
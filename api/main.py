@@ -1,16 +1,29 @@
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, HTTPException, Query, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import Optional, List
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, List, Literal
+import hashlib
 import logging
+import os
+
+import anyio
 
 from .models import (
     ResumoResponse,
     FiltrosResumo,
     ResumoPaginado,
-    HealthCheck
+    HealthCheck,
+    DashboardResponse,
+    SeriesResponse
 )
-from .utils import query_resumo, get_resumo_aggregations, check_database_health
+from . import utils
+from .snapshot import CursorInvalido
+from .exportacao import FORMATOS
+from .serializacao import RespostaJSON
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -24,7 +37,94 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Configurar CORS
+# Rotas cujas respostas dependem só da versão publicada do banco e dos parâmetros
+ROTAS_CONDICIONAIS = ("/resumo", "/dashboard")
+
+
+def calcular_etag(versao, request: Request) -> str:
+    """
+    ETag de uma resposta: versão publicada do banco + versão da API + rota + parâmetros. É fraca
+    (W/): as versões com e sem gzip do mesmo conteúdo compartilham a ETag.
+    """
+    parametros = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    base = f"{versao}|{app.version}|{request.url.path}|{parametros}"
+    return 'W/"' + hashlib.sha1(base.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _etag_corresponde(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca (exigida para If-None-Match): ignora o prefixo W/ dos dois lados
+    etag = etag.removeprefix("W/")
+    candidatos = (c.strip().removeprefix("W/") for c in if_none_match.split(","))
+    return etag in candidatos
+
+
+def _acrescentar_vary(response: Response, cabecalho: str) -> None:
+    vary = response.headers.get("Vary")
+    if vary is None:
+        response.headers["Vary"] = cabecalho
+    elif cabecalho.lower() not in (v.strip().lower() for v in vary.split(",")):
+        response.headers["Vary"] = f"{vary}, {cabecalho}"
+
+
+def _nao_modificado_desde(if_modified_since: str, modificado_em: datetime) -> bool:
+    try:
+        data = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return data.tzinfo is not None and modificado_em.replace(microsecond=0) <= data
+
+
+async def cache_condicional(request: Request, call_next):
+    """
+    Requisições condicionais para /resumo* e /dashboard: os dados só mudam quando o ETL publica
+    um novo banco, então a ETag deriva da versão publicada (inode + mtime) e dos parâmetros.
+    If-None-Match/If-Modified-Since válidos recebem 304 sem consultar o banco.
+    """
+    if request.method not in ("GET", "HEAD") or not request.url.path.startswith(ROTAS_CONDICIONAIS):
+        return await call_next(request)
+
+    try:
+        versao = utils.get_db_version()
+    except FileNotFoundError:
+        return await call_next(request)
+
+    etag = calcular_etag(versao, request)
+    modificado_em = datetime.fromtimestamp(versao[1] / 1e9, tz=timezone.utc)
+    cabecalhos = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(modificado_em.replace(microsecond=0), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        nao_modificado = _etag_corresponde(if_none_match, etag)
+    else:
+        nao_modificado = if_modified_since is not None and _nao_modificado_desde(if_modified_since, modificado_em)
+
+    if nao_modificado:
+        response = Response(status_code=304, headers=cabecalhos)
+        _acrescentar_vary(response, "Accept-Encoding")
+        return response
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(cabecalhos)
+        # A representação (gzip ou não) depende do Accept-Encoding, mesmo abaixo do tamanho mínimo
+        _acrescentar_vary(response, "Accept-Encoding")
+    return response
+
+
+# Compressão negociada pelo Accept-Encoding (respostas grandes de /resumo, /dashboard e exportações)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Registrado depois (por fora) da compressão: os cabeçalhos de cache vão na resposta final
+app.add_middleware(BaseHTTPMiddleware, dispatch=cache_condicional)
+
+# Configurar CORS (adicionado por último para envolver também as respostas 304)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Em produção, especifique origens específicas
@@ -33,6 +133,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Acesso ao banco é síncrono (sqlite3/pandas): roda num pool de threads limitado para não
+# bloquear o event loop. Cada thread reaproveita sua própria conexão (ver utils.get_db_connection).
+DB_THREADS = int(os.environ.get("API_DB_THREADS", "8"))
+_limitador_db = anyio.CapacityLimiter(DB_THREADS)
+
+
+async def executar_no_banco(func, *args):
+    """Executa `func(*args)` numa thread do pool de acesso ao banco"""
+    return await anyio.to_thread.run_sync(func, *args, limiter=_limitador_db)
+
+
+async def iterar_no_banco(partes):
+    """Consome um gerador síncrono que lê do banco sem bloquear o event loop"""
+    try:
+        while True:
+            parte = await executar_no_banco(next, partes, None)
+            if parte is None:
+                break
+            yield parte
+    finally:
+        # Cliente desconectado ou fim da exportação: fecha o gerador (e a conexão dele)
+        await executar_no_banco(partes.close)
+
+
+def _validar_mes_ano(mes_ano: Optional[str]):
+    if mes_ano:
+        if len(mes_ano) != 7 or mes_ano[4] != '-':
+            raise HTTPException(
+                status_code=400,
+                detail="Formato de mês-ano inválido. Use YYYY-MM"
+            )
+
 
 @app.get("/", include_in_schema=False)
 async def root():
@@ -42,7 +174,7 @@ async def root():
 @app.get("/health", response_model=HealthCheck, tags=["Health Check"])
 async def health_check():
     """Endpoint de health check da API"""
-    db_healthy = check_database_health()
+    db_healthy = await executar_no_banco(utils.check_database_health)
     return HealthCheck(
         status="OK" if db_healthy else "WARNING",
         database=db_healthy
@@ -55,7 +187,8 @@ async def get_resumo(
         status: Optional[str] = Query(None, description="Filtrar por status do título"),
         mes_ano: Optional[str] = Query(None, description="Filtrar por mês-ano (formato: YYYY-MM)"),
         page: int = Query(1, ge=1, description="Número da página"),
-        limit: int = Query(10, ge=1, le=100, description="Limite de registros por página")
+        limit: int = Query(10, ge=1, le=100, description="Limite de registros por página"),
+        cursor: Optional[str] = Query(None, description="Cursor (next_cursor) da página anterior")
 ):
     """
     Retorna o resumo mensal de cobranças com opções de filtro e paginação.
@@ -65,26 +198,21 @@ async def get_resumo(
     - **mes_ano**: Filtra por mês e ano (formato: YYYY-MM)
     - **page**: Número da página para paginação
     - **limit**: Quantidade de registros por página
+    - **cursor**: Continua após o `next_cursor` da resposta anterior (paginação por chave; ignora `page`)
     """
     try:
         # Validar formato do mes_ano se fornecido
-        if mes_ano:
-            if len(mes_ano) != 7 or mes_ano[4] != '-':
-                raise HTTPException(
-                    status_code=400,
-                    detail="Formato de mês-ano inválido. Use YYYY-MM"
-                )
-
-        resultado = query_resumo(credor, status, mes_ano, page, limit)
-
-        return ResumoPaginado(
-            data=resultado["data"],
-            total=resultado["total"],
-            page=resultado["page"],
-            limit=resultado["limit"],
-            total_pages=resultado["total_pages"]
-        )
+        _validar_mes_ano(mes_ano)
+
+        resultado = await executar_no_banco(utils.query_resumo, credor, status, mes_ano, page, limit, cursor)
+
+        # Linhas do snapshot já no formato de ResumoPaginado: serializar sem validar linha a linha
+        return RespostaJSON(resultado)
 
+    except HTTPException:
+        raise
+    except CursorInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except FileNotFoundError as e:
         logger.error(f"Banco de dados não encontrado: {e}")
         raise HTTPException(
@@ -96,6 +224,100 @@ async def get_resumo(
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 
+@app.get("/dashboard", response_model=DashboardResponse, tags=["Dashboard"])
+async def get_dashboard(
+        credor: Optional[str] = Query(None, description="Filtrar por nome do credor"),
+        status: Optional[str] = Query(None, description="Filtrar por status do título"),
+        mes_ano: Optional[str] = Query(None, description="Filtrar por mês-ano (formato: YYYY-MM)"),
+        page: int = Query(1, ge=1, description="Número da página"),
+        limit: int = Query(10, ge=1, le=100, description="Limite de registros por página"),
+        top: Optional[int] = Query(None, ge=1, le=1000, description="Credores na série por credor (demais em 'Outros')")
+):
+    """
+    Carga inicial do dashboard numa única chamada.
+
+    Retorna as opções dos filtros, a página do resumo, os totais (KPIs) e as séries dos gráficos
+    para os filtros informados, todos calculados numa única passada sobre os dados, e o health.
+    """
+    _validar_mes_ano(mes_ano)
+
+    try:
+        painel = await executar_no_banco(utils.get_dashboard, credor, status, mes_ano, page, limit, top)
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
+    except Exception as e:
+        logger.error(f"Erro ao montar o dashboard: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+    health = HealthCheck(status="OK", version=app.version, database=True)
+    return RespostaJSON({**painel, "health": health.model_dump()})
+
+
+@app.get("/resumo/series", response_model=SeriesResponse, tags=["Resumo"])
+async def get_series(
+        credor: Optional[str] = Query(None, description="Filtrar por nome do credor"),
+        status: Optional[str] = Query(None, description="Filtrar por status do título"),
+        mes_ano: Optional[str] = Query(None, description="Filtrar por mês-ano (formato: YYYY-MM)"),
+        top: Optional[int] = Query(None, ge=1, le=1000, description="Credores na série por credor (demais em 'Outros')")
+):
+    """
+    Séries prontas para gráficos sobre todas as linhas que atendem aos filtros.
+
+    - **totais**: valor total, quantidade, valor médio e credores únicos
+    - **series.por_mes**: valor total e quantidade por mês
+    - **series.por_credor**: valor total, quantidade e participação por credor (maiores primeiro)
+    """
+    _validar_mes_ano(mes_ano)
+
+    try:
+        return RespostaJSON(await executar_no_banco(utils.get_series, credor, status, mes_ano, top))
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
+    except Exception as e:
+        logger.error(f"Erro ao calcular séries: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+
+@app.get("/resumo/export", tags=["Resumo"])
+async def exportar_resumo(
+        formato: Literal["csv", "ndjson", "arrow"] = Query("csv", description="Formato: csv, ndjson ou arrow (IPC stream)"),
+        credor: Optional[str] = Query(None, description="Filtrar por nome do credor"),
+        status: Optional[str] = Query(None, description="Filtrar por status do título"),
+        mes_ano: Optional[str] = Query(None, description="Filtrar por mês-ano (formato: YYYY-MM)")
+):
+    """
+    Exporta todas as linhas do resumo que atendem aos filtros, sem paginação.
+
+    A resposta é enviada em partes, lidas do banco em lotes: o uso de memória não depende do
+    tamanho do resultado.
+    """
+    _validar_mes_ano(mes_ano)
+
+    try:
+        partes = await executar_no_banco(utils.preparar_exportacao, formato, credor, status, mes_ano)
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
+
+    media_type, extensao = FORMATOS[formato]
+    return StreamingResponse(
+        iterar_no_banco(partes),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="resumo_mensal.{extensao}"'}
+    )
+
+
 @app.get("/resumo/aggregations", tags=["Resumo"])
 async def get_resumo_aggregations():
     """
@@ -104,9 +326,15 @@ async def get_resumo_aggregations():
     Inclui totais por status, por credor e estatísticas gerais.
     """
     try:
-        aggregations = get_resumo_aggregations()
+        aggregations = await executar_no_banco(utils.get_resumo_aggregations)
         return aggregations
 
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
     except Exception as e:
         logger.error(f"Erro ao obter agregações: {e}")
         raise HTTPException(status_code=500, detail="Erro ao processar agregações")
@@ -118,15 +346,15 @@ async def get_meses_disponiveis():
     Retorna lista de meses disponíveis no resumo.
     """
     try:
-        from .utils import get_db_connection
-        conn = get_db_connection()
-
-        query = "SELECT DISTINCT MES_ANO FROM resumo_mensal ORDER BY MES_ANO DESC"
-        meses = [row['MES_ANO'] for row in conn.execute(query).fetchall()]
-
-        conn.close()
+        meses = await executar_no_banco(utils.get_meses_disponiveis)
         return {"meses": meses}
 
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
     except Exception as e:
         logger.error(f"Erro ao obter meses: {e}")
         raise HTTPException(status_code=500, detail="Erro ao obter meses disponíveis")
@@ -138,20 +366,28 @@ async def get_credores_disponiveis():
     Retorna lista de credores disponíveis no resumo.
     """
     try:
-        from .utils import get_db_connection
-        conn = get_db_connection()
-
-        query = "SELECT DISTINCT CREDOR FROM resumo_mensal ORDER BY CREDOR"
-        credores = [row['CREDOR'] for row in conn.execute(query).fetchall()]
-
-        conn.close()
+        credores = await executar_no_banco(utils.get_credores_disponiveis)
         return {"credores": credores}
 
+    except FileNotFoundError as e:
+        logger.error(f"Banco de dados não encontrado: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Banco de dados não disponível. Execute o ETL primeiro."
+        )
     except Exception as e:
         logger.error(f"Erro ao obter credores: {e}")
         raise HTTPException(status_code=500, detail="Erro ao obter credores disponíveis")
 
 
+@app.get("/cache/estatisticas", tags=["Health Check"])
+async def get_cache_estatisticas():
+    """
+    Retorna os contadores do cache de respostas (hits, misses, evictions) para dimensionamento.
+    """
+    return utils.cache_resultados.estatisticas()
+
+
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
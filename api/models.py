@@ -39,9 +39,54 @@ class ResumoPaginado(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = Field(None, description="Cursor da próxima página (nulo na última)")
 
 
 class HealthCheck(BaseModel):
     status: str = "OK"
     version: str = "1.0.0"
-    database: bool = False
\ No newline at end of file
+    database: bool = False
+
+
+class FiltrosDisponiveis(BaseModel):
+    meses: List[str] = Field(..., description="Meses disponíveis, do mais recente ao mais antigo")
+    credores: List[str] = Field(..., description="Credores disponíveis")
+    status: List[str] = Field(..., description="Status de título disponíveis")
+
+
+class TotaisResumo(BaseModel):
+    valor_total: float = Field(..., description="Soma de VALOR_TOTAL das linhas filtradas")
+    quantidade: int = Field(..., description="Soma de QUANTIDADE das linhas filtradas")
+    valor_medio: float = Field(..., description="valor_total / quantidade")
+    credores_unicos: int = Field(..., description="Credores distintos nas linhas filtradas")
+
+
+class PontoMensal(BaseModel):
+    mes_ano: str
+    valor_total: float
+    quantidade: int
+
+
+class PontoCredor(BaseModel):
+    credor: str = Field(..., description="Nome do credor (ou 'Outros (N credores)' além do top)")
+    valor_total: float
+    quantidade: int
+    participacao: float = Field(..., description="Fração do valor total filtrado (0 a 1)")
+
+
+class SeriesResumo(BaseModel):
+    por_mes: List[PontoMensal]
+    por_credor: List[PontoCredor]
+
+
+class SeriesResponse(BaseModel):
+    totais: TotaisResumo
+    series: SeriesResumo
+
+
+class DashboardResponse(BaseModel):
+    filtros: FiltrosDisponiveis
+    resumo: ResumoPaginado
+    totais: TotaisResumo
+    series: SeriesResumo
+    health: HealthCheck
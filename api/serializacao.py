@@ -0,0 +1,27 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o json da biblioteca padrão
+    orjson = None
+
+
+def dumps_json(conteudo: Any) -> bytes:
+    """Serializa dicts/listas de tipos nativos (linhas do banco já convertidas) em JSON UTF-8"""
+    if orjson is not None:
+        return orjson.dumps(conteudo)
+    return json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    """
+    Resposta JSON para dados que já vêm no formato do response_model (linhas confiáveis do
+    banco/snapshot): serializa direto, sem construir e validar um modelo Pydantic por linha.
+    O response_model do endpoint continua valendo para a documentação (OpenAPI).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
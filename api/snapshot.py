@@ -0,0 +1,296 @@
+import base64
+import json
+import numpy as np
+import pandas as pd
+from typing import Optional, Dict, Any, List, Sequence, Union
+
+# Colunas carregadas de resumo_mensal, já na ordem de apresentação da API
+QUERY_SNAPSHOT = """
+SELECT MES_ANO, CREDOR, STATUS_TITULO, QUANTIDADE, VALOR_TOTAL, VALOR_MEDIO
+FROM resumo_mensal
+ORDER BY MES_ANO, CREDOR, STATUS_TITULO
+"""
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado"""
+
+
+def codificar_cursor(mes_ano: str, credor: str, status: str) -> str:
+    """Gera o cursor opaco que aponta para a chave (MES_ANO, CREDOR, STATUS_TITULO) de uma linha"""
+    bruto = json.dumps([mes_ano, credor, status], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        chave = json.loads(bruto.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise CursorInvalido(f"Cursor inválido: {cursor}")
+    if not (isinstance(chave, list) and len(chave) == 3 and all(isinstance(v, str) for v in chave)):
+        raise CursorInvalido(f"Cursor inválido: {cursor}")
+    return tuple(chave)
+
+
+class ResumoSnapshot:
+    """
+    Cópia colunar de resumo_mensal em memória.
+
+    MES_ANO, CREDOR e STATUS_TITULO são codificados por dicionário (códigos inteiros + valores
+    distintos ordenados) e as linhas ficam pré-ordenadas por (MES_ANO, CREDOR, STATUS_TITULO),
+    então filtros viram máscaras vetorizadas e a paginação é uma fatia. A paginação por cursor
+    (keyset) localiza a chave com busca binária, então qualquer página custa o mesmo.
+    """
+
+    def __init__(self, df: pd.DataFrame, versao=None):
+        self.versao = versao
+        self.total = len(df)
+
+        self.mes_codigos, self.meses = pd.factorize(df['MES_ANO'], sort=True)
+        self.credor_codigos, self.credores = pd.factorize(df['CREDOR'], sort=True)
+        self.status_codigos, self.status = pd.factorize(df['STATUS_TITULO'], sort=True)
+
+        self.quantidade = df['QUANTIDADE'].to_numpy(dtype=np.int64)
+        self.valor_total = df['VALOR_TOTAL'].to_numpy(dtype=np.float64)
+        self.valor_medio = df['VALOR_MEDIO'].to_numpy(dtype=np.float64)
+
+        # Chave inteira crescente na ordem das linhas: (mes, credor, status) em base mista
+        self._n_credores = max(len(self.credores), 1)
+        self._n_status = max(len(self.status), 1)
+        self.chave = (
+            (self.mes_codigos.astype(np.int64) * self._n_credores + self.credor_codigos)
+            * self._n_status + self.status_codigos
+        )
+
+    @classmethod
+    def carregar(cls, conn, versao=None) -> "ResumoSnapshot":
+        """Lê resumo_mensal inteiro da conexão informada"""
+        return cls(pd.read_sql_query(QUERY_SNAPSHOT, conn), versao)
+
+    @staticmethod
+    def _codigos_filtro(valores, filtro: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Códigos do dicionário que atendem a um filtro de texto: uma string é buscada como
+        substring sem diferenciar maiúsculas; uma lista traz os valores exatos já resolvidos
+        pelo índice de busca do banco (ver utils.buscar_termos).
+        """
+        if isinstance(filtro, str):
+            texto = filtro.lower()
+            return np.flatnonzero([texto in valor.lower() for valor in valores])
+
+        codigos = valores.get_indexer(list(filtro))
+        return codigos[codigos >= 0]
+
+    def resolver(self, campo: str, texto: str) -> List[str]:
+        """Valores distintos de `campo` ('credor' ou 'status') que contêm `texto`"""
+        valores = self.credores if campo == "credor" else self.status
+        return valores[self._codigos_filtro(valores, texto)].tolist()
+
+    def filtrar(
+            self,
+            credor: Optional[Union[str, Sequence[str]]] = None,
+            status: Optional[Union[str, Sequence[str]]] = None,
+            mes_ano: Optional[str] = None
+    ) -> np.ndarray:
+        """Retorna os índices (em ordem) das linhas que atendem aos filtros"""
+        mask = np.ones(self.total, dtype=bool)
+
+        if credor is not None and credor != "":
+            mask &= np.isin(self.credor_codigos, self._codigos_filtro(self.credores, credor))
+
+        if status is not None and status != "":
+            mask &= np.isin(self.status_codigos, self._codigos_filtro(self.status, status))
+
+        if mes_ano:
+            codigo = self.meses.get_indexer([mes_ano])[0]
+            mask &= self.mes_codigos == codigo
+
+        return np.flatnonzero(mask)
+
+    def _limite_cursor(self, mes_ano: str, credor: str, status: str) -> int:
+        """
+        Menor chave inteira estritamente posterior a (mes_ano, credor, status). A tupla do cursor
+        não precisa existir no snapshot: valores ausentes caem na posição em que seriam inseridos.
+        """
+        m = int(np.searchsorted(self.meses, mes_ano))
+        if m == len(self.meses) or self.meses[m] != mes_ano:
+            return m * self._n_credores * self._n_status
+
+        c = int(np.searchsorted(self.credores, credor))
+        if c == len(self.credores) or self.credores[c] != credor:
+            return (m * self._n_credores + c) * self._n_status
+
+        s = int(np.searchsorted(self.status, status, side='right'))
+        return (m * self._n_credores + c) * self._n_status + s
+
+    def linhas(self, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """Monta os registros da API para os índices informados"""
+        return [
+            {
+                "mes_ano": mes_ano,
+                "credor": credor,
+                "status_titulo": status,
+                "quantidade": quantidade,
+                "valor_total": valor_total,
+                "valor_medio": valor_medio
+            }
+            for mes_ano, credor, status, quantidade, valor_total, valor_medio in zip(
+                self.meses[self.mes_codigos[indices]].tolist(),
+                self.credores[self.credor_codigos[indices]].tolist(),
+                self.status[self.status_codigos[indices]].tolist(),
+                self.quantidade[indices].tolist(),
+                self.valor_total[indices].tolist(),
+                self.valor_medio[indices].tolist()
+            )
+        ]
+
+    def consultar(
+            self,
+            credor: Optional[Union[str, Sequence[str]]] = None,
+            status: Optional[Union[str, Sequence[str]]] = None,
+            mes_ano: Optional[str] = None,
+            page: int = 1,
+            limit: int = 10,
+            cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Mesmo contrato de utils.query_resumo, respondido da memória. Com `cursor`, a página começa
+        logo após a chave codificada nele e `page` é ignorado.
+        """
+        return self.paginar(self.filtrar(credor, status, mes_ano), page, limit, cursor)
+
+    def paginar(
+            self,
+            indices: np.ndarray,
+            page: int = 1,
+            limit: int = 10,
+            cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Página (por número ou cursor) dos índices já filtrados, com o total"""
+        total = len(indices)
+
+        if cursor:
+            limite = self._limite_cursor(*decodificar_cursor(cursor))
+            inicio = int(np.searchsorted(self.chave[indices], limite))
+        else:
+            inicio = (page - 1) * limit
+        pagina = indices[inicio:inicio + limit]
+
+        next_cursor = None
+        if inicio + limit < total:
+            ultimo = pagina[-1]
+            next_cursor = codificar_cursor(
+                self.meses[self.mes_codigos[ultimo]],
+                self.credores[self.credor_codigos[ultimo]],
+                self.status[self.status_codigos[ultimo]]
+            )
+
+        return {
+            "data": self.linhas(pagina),
+            "total": total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (total + limit - 1) // limit,
+            "next_cursor": next_cursor
+        }
+
+    def agregar(self, indices: np.ndarray, top: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Totais (KPIs) e séries dos gráficos sobre as linhas filtradas, com bincount nos códigos
+        do dicionário: o resultado tem um ponto por mês e por credor, qualquer que seja o volume.
+
+        Com `top`, a série por credor traz só os `top` maiores valores e soma os demais num
+        ponto "Outros"; `participacao` é a fração do valor total de cada ponto.
+        """
+        codigos_mes = self.mes_codigos[indices]
+        codigos_credor = self.credor_codigos[indices]
+        valores = self.valor_total[indices]
+        quantidades = self.quantidade[indices]
+
+        n_meses, n_credores = len(self.meses), len(self.credores)
+        linhas_mes = np.bincount(codigos_mes, minlength=n_meses)
+        valor_mes = np.bincount(codigos_mes, weights=valores, minlength=n_meses)
+        qtd_mes = np.bincount(codigos_mes, weights=quantidades, minlength=n_meses)
+
+        linhas_credor = np.bincount(codigos_credor, minlength=n_credores)
+        valor_credor = np.bincount(codigos_credor, weights=valores, minlength=n_credores)
+        qtd_credor = np.bincount(codigos_credor, weights=quantidades, minlength=n_credores)
+
+        presentes_mes = np.flatnonzero(linhas_mes)
+        # Credores do maior para o menor valor total (empate: ordem alfabética)
+        presentes_credor = np.flatnonzero(linhas_credor)
+        presentes_credor = presentes_credor[np.argsort(-valor_credor[presentes_credor], kind='stable')]
+
+        valor_total = float(valores.sum())
+        quantidade = int(quantidades.sum())
+
+        por_credor = [
+            {"credor": credor, "valor_total": valor, "quantidade": int(qtd)}
+            for credor, valor, qtd in zip(
+                self.credores[presentes_credor].tolist(),
+                valor_credor[presentes_credor].tolist(),
+                qtd_credor[presentes_credor].tolist()
+            )
+        ]
+        if top is not None and len(por_credor) > top:
+            demais = por_credor[top:]
+            por_credor = por_credor[:top] + [{
+                "credor": f"Outros ({len(demais)} credores)",
+                "valor_total": sum(p["valor_total"] for p in demais),
+                "quantidade": sum(p["quantidade"] for p in demais),
+            }]
+        for ponto in por_credor:
+            ponto["participacao"] = round(ponto["valor_total"] / valor_total, 4) if valor_total else 0.0
+            ponto["valor_total"] = round(ponto["valor_total"], 2)
+
+        return {
+            "totais": {
+                "valor_total": round(valor_total, 2),
+                "quantidade": quantidade,
+                "valor_medio": round(valor_total / quantidade, 2) if quantidade else 0.0,
+                "credores_unicos": len(presentes_credor),
+            },
+            "series": {
+                "por_mes": [
+                    {"mes_ano": mes_ano, "valor_total": round(valor, 2), "quantidade": int(qtd)}
+                    for mes_ano, valor, qtd in zip(
+                        self.meses[presentes_mes].tolist(),
+                        valor_mes[presentes_mes].tolist(),
+                        qtd_mes[presentes_mes].tolist()
+                    )
+                ],
+                "por_credor": por_credor,
+            },
+        }
+
+    def painel(
+            self,
+            credor: Optional[Union[str, Sequence[str]]] = None,
+            status: Optional[Union[str, Sequence[str]]] = None,
+            mes_ano: Optional[str] = None,
+            page: int = 1,
+            limit: int = 10,
+            top: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Tudo o que o dashboard precisa numa única filtragem: opções, página, totais e séries"""
+        indices = self.filtrar(credor, status, mes_ano)
+        return {
+            "filtros": {
+                "meses": self.meses[::-1].tolist(),
+                "credores": self.credores.tolist(),
+                "status": self.status.tolist(),
+            },
+            "resumo": self.paginar(indices, page, limit),
+            **self.agregar(indices, top),
+        }
+
+    def series(
+            self,
+            credor: Optional[Union[str, Sequence[str]]] = None,
+            status: Optional[Union[str, Sequence[str]]] = None,
+            mes_ano: Optional[str] = None,
+            top: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Totais e séries (por mês e por credor) das linhas que atendem aos filtros"""
+        return self.agregar(self.filtrar(credor, status, mes_ano), top)
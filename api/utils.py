@@ -1,42 +1,182 @@
+import os
 import sqlite3
-import pandas as pd
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, Iterator
 from pathlib import Path
 import logging
 
+from .cache import CacheResultados, normalizar_filtro
+from .exportacao import exportar
+from .snapshot import ResumoSnapshot, CursorInvalido
+
 logger = logging.getLogger(__name__)
 
 
-def get_db_connection():
-    """Retorna conexão com o banco SQLite"""
+# Caminho do banco publicado pelo ETL (pode ser sobrescrito por RESUMO_DB_PATH)
+DB_PATH = os.environ.get(
+    "RESUMO_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "resumo.bd")
+)
+
+# Pool de conexões: uma conexão somente leitura por thread, reaproveitada entre requisições
+_pool = threading.local()
+
+# Snapshot colunar de resumo_mensal compartilhado pelas threads da API
+_snapshot: Optional[ResumoSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+# Cache de respostas de /resumo e /resumo/aggregations (chave: filtros normalizados + versão do banco)
+cache_resultados = CacheResultados(
+    maxsize=int(os.environ.get("API_CACHE_TAMANHO", "1024")),
+    ttl=float(os.environ.get("API_CACHE_TTL", "300"))
+)
+
+# Agregações pré-calculadas pelo ETL (tabelas resumo_por_status, resumo_por_credor e resumo_totais)
+CONSULTAS_ROLLUP = {
+    "por_status": "SELECT STATUS_TITULO, total_registros, total_valor FROM resumo_por_status ORDER BY STATUS_TITULO",
+    "por_credor": "SELECT CREDOR, total_registros, total_valor FROM resumo_por_credor ORDER BY CREDOR",
+    "totais_gerais": "SELECT total_registros, total_valor, total_meses, total_credores FROM resumo_totais",
+}
+
+# Mesmas agregações calculadas sobre resumo_mensal, para bancos sem as tabelas acima
+CONSULTAS_AGREGACAO = {
+    "por_status": """
+    SELECT STATUS_TITULO, SUM(QUANTIDADE) as total_registros, ROUND(SUM(VALOR_TOTAL), 2) as total_valor
+    FROM resumo_mensal
+    GROUP BY STATUS_TITULO
+    ORDER BY STATUS_TITULO
+    """,
+    "por_credor": """
+    SELECT CREDOR, SUM(QUANTIDADE) as total_registros, ROUND(SUM(VALOR_TOTAL), 2) as total_valor
+    FROM resumo_mensal
+    GROUP BY CREDOR
+    ORDER BY CREDOR
+    """,
+    "totais_gerais": """
+    SELECT
+        COALESCE(SUM(QUANTIDADE), 0) as total_registros,
+        ROUND(COALESCE(SUM(VALOR_TOTAL), 0), 2) as total_valor,
+        COUNT(DISTINCT MES_ANO) as total_meses,
+        COUNT(DISTINCT CREDOR) as total_credores
+    FROM resumo_mensal
+    """,
+}
+
+# Índice de busca dos filtros de texto (tabelas termos_busca e termos_busca_fts, geradas pelo ETL)
+QUERY_BUSCA_FTS = """
+SELECT VALOR FROM termos_busca
+WHERE rowid IN (SELECT rowid FROM termos_busca_fts WHERE termos_busca_fts MATCH ?) AND CAMPO = ?
+"""
+QUERY_BUSCA_TERMOS = "SELECT VALOR FROM termos_busca WHERE CAMPO = ? AND instr(VALOR_NORMALIZADO, ?) > 0"
+
+PRAGMAS_LEITURA = [
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+]
+
+
+def get_db_version():
+    """
+    Identifica a versão publicada do banco (inode + mtime). O ETL publica cada versão com
+    rename atômico, então uma versão nova sempre muda esse par.
+    """
     try:
-        # ✅ CORREÇÃO DEFINITIVA DO CAMINHO
-        import os
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        db_path = os.path.join(project_root, "data", "resumo.bd")
-
-        print(f"🔍 Tentando conectar em: {db_path}")
-        print(f"📁 Arquivo existe: {os.path.exists(db_path)}")
-
-        if not os.path.exists(db_path):
-            # Listar arquivos na pasta data para debug
-            data_dir = os.path.join(project_root, "data")
-            if os.path.exists(data_dir):
-                files = os.listdir(data_dir)
-                print(f"📂 Arquivos em data/: {files}")
-            raise FileNotFoundError(f"Banco de dados não encontrado: {db_path}")
-
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        print("✅ Conexão bem-sucedida!")
+        st = os.stat(DB_PATH)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Banco de dados não encontrado: {DB_PATH}")
+    return st.st_ino, st.st_mtime_ns
+
+
+def _abrir_conexao(**kwargs):
+    conn = sqlite3.connect(Path(DB_PATH).resolve().as_uri() + "?mode=ro", uri=True, **kwargs)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS_LEITURA:
+        conn.execute(pragma)
+    return conn
+
+
+def abrir_conexao_dedicada():
+    """
+    Abre uma conexão somente leitura fora do pool, para leituras longas (exportação) que
+    avançam o cursor em threads diferentes. Quem abre deve fechá-la.
+    """
+    get_db_version()  # FileNotFoundError se o banco ainda não foi publicado
+    return _abrir_conexao(check_same_thread=False)
+
+
+def get_db_connection():
+    """
+    Retorna a conexão somente leitura da thread atual com o banco SQLite.
+
+    A conexão é reaproveitada entre requisições e não deve ser fechada por quem a usa;
+    quando o ETL publica uma nova versão do banco, ela é descartada e reaberta.
+    """
+    versao = get_db_version()
+
+    conn = getattr(_pool, "conn", None)
+    if conn is not None and _pool.versao == versao:
         return conn
 
-    except Exception as e:
-        print(f"💥 Erro na conexão: {e}")
-        import traceback
-        traceback.print_exc()
-        raise
+    if conn is not None:
+        logger.info("Nova versão do banco detectada; reabrindo conexão")
+        conn.close()
+
+    _pool.conn = _abrir_conexao()
+    _pool.versao = versao
+    return _pool.conn
+
+
+def buscar_termos(conn, campo: str, texto: str) -> Optional[List[str]]:
+    """
+    Valores de `campo` ('credor' ou 'status') que contêm `texto`, sem diferenciar maiúsculas,
+    consultando o índice de busca gerado pelo ETL (trigramas FTS5 para textos com 3+ caracteres).
+    Retorna None se o banco não tiver o índice; nesse caso o snapshot faz a busca sozinho.
+    """
+    normalizado = texto.lower()
+
+    if len(normalizado) >= 3:
+        try:
+            frase = '"' + normalizado.replace('"', '""') + '"'
+            return [row["VALOR"] for row in conn.execute(QUERY_BUSCA_FTS, (frase, campo))]
+        except sqlite3.OperationalError:
+            pass  # SQLite sem FTS5: varrer os valores distintos
+
+    try:
+        return [row["VALOR"] for row in conn.execute(QUERY_BUSCA_TERMOS, (campo, normalizado))]
+    except sqlite3.OperationalError:
+        return None
+
+
+def resolver_filtro(conn, campo: str, texto: Optional[str]) -> Optional[List[str]]:
+    """
+    Valores exatos de `campo` que atendem ao filtro de texto (None se não há filtro). Sem o
+    índice de busca no banco, a busca é feita nos valores distintos do snapshot.
+    """
+    if not texto:
+        return None
+    valores = buscar_termos(conn, campo, texto)
+    if valores is None:
+        valores = get_snapshot().resolver(campo, texto)
+    return valores
+
+
+def get_snapshot() -> ResumoSnapshot:
+    """
+    Retorna o snapshot em memória de resumo_mensal, recarregando-o quando o ETL publica
+    uma nova versão do banco.
+    """
+    global _snapshot
+    versao = get_db_version()
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.versao == versao:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.versao != versao:
+            _snapshot = ResumoSnapshot.carregar(get_db_connection(), versao)
+            logger.info(f"Snapshot de resumo_mensal carregado: {_snapshot.total} linhas")
+        return _snapshot
 
 
 def query_resumo(
@@ -44,124 +184,126 @@ def query_resumo(
         status: Optional[str] = None,
         mes_ano: Optional[str] = None,
         page: int = 1,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Consulta o resumo do banco de dados com filtros e paginação
+    Consulta o resumo com filtros e paginação, respondida a partir do snapshot em memória.
+
+    A paginação pode ser por página (`page`) ou por cursor (`cursor`, o `next_cursor` da
+    resposta anterior); o total sai da mesma filtragem que produz a página.
     """
     try:
-        print(f"🔍 Iniciando query_resumo com filtros: credor={credor}, status={status}, mes_ano={mes_ano}")
+        logger.debug(f"query_resumo com filtros: credor={credor}, status={status}, mes_ano={mes_ano}")
 
-        conn = get_db_connection()
+        credor, status = normalizar_filtro(credor), normalizar_filtro(status)
+        mes_ano = mes_ano or None
+        chave = ("resumo", credor, status, mes_ano, page, limit, cursor or None)
 
-        # ✅ CORREÇÃO: Usar as colunas exatas do banco
-        query = "SELECT MES_ANO, CREDOR, STATUS_TITULO, QUANTIDADE, VALOR_TOTAL, VALOR_MEDIO FROM resumo_mensal WHERE 1=1"
-        count_query = "SELECT COUNT(*) as total FROM resumo_mensal WHERE 1=1"
-        params = []
-
-        # Aplicar filtros
-        if credor:
-            query += " AND CREDOR LIKE ?"
-            count_query += " AND CREDOR LIKE ?"
-            params.append(f"%{credor}%")
-
-        if status:
-            query += " AND STATUS_TITULO LIKE ?"
-            count_query += " AND STATUS_TITULO LIKE ?"
-            params.append(f"%{status}%")
-
-        if mes_ano:
-            query += " AND MES_ANO = ?"
-            count_query += " AND MES_ANO = ?"
-            params.append(mes_ano)
-
-        # Ordenação
-        query += " ORDER BY MES_ANO, CREDOR, STATUS_TITULO"
-
-        # Paginação
-        offset = (page - 1) * limit
-        query += " LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-
-        print(f"📝 Query: {query}")
-        print(f"📋 Parâmetros: {params}")
-
-        # Executar queries
-        cursor = conn.execute(query, params)
-
-        # ✅ Converter para dicionário com nomes de campos corretos
-        resultados = []
-        for row in cursor.fetchall():
-            resultados.append({
-                "mes_ano": row["MES_ANO"],
-                "credor": row["CREDOR"],
-                "status_titulo": row["STATUS_TITULO"],
-                "quantidade": row["QUANTIDADE"],
-                "valor_total": row["VALOR_TOTAL"],
-                "valor_medio": row["VALOR_MEDIO"]
-            })
-
-        print(f"📊 Resultados encontrados: {len(resultados)}")
-
-        # Contar total de registros (sem paginação)
-        cursor_count = conn.execute(count_query, params[:-2])  # Remove LIMIT e OFFSET
-        total = cursor_count.fetchone()['total']
+        def consultar():
+            conn = get_db_connection()
+            return get_snapshot().consultar(
+                resolver_filtro(conn, "credor", credor),
+                resolver_filtro(conn, "status", status),
+                mes_ano, page, limit, cursor
+            )
 
-        conn.close()
-
-        return {
-            "data": resultados,
-            "total": total,
-            "page": page,
-            "limit": limit,
-            "total_pages": (total + limit - 1) // limit
-        }
+        return cache_resultados.obter(chave, get_db_version(), consultar)
 
+    except CursorInvalido:
+        raise
     except Exception as e:
-        print(f"💥 Erro fatal em query_resumo: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Erro fatal em query_resumo: {e}")
         raise
 
 
-def get_resumo_aggregations() -> Dict[str, Any]:
-    """Retorna agregações totais do resumo"""
+def preparar_exportacao(
+        formato: str,
+        credor: Optional[str] = None,
+        status: Optional[str] = None,
+        mes_ano: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Resolve os filtros e retorna o gerador que exporta todas as linhas correspondentes
+    (ver exportacao.exportar). A conexão dedicada é fechada pelo próprio gerador.
+    """
+    conn = abrir_conexao_dedicada()
     try:
+        credores = resolver_filtro(conn, "credor", credor)
+        status_titulo = resolver_filtro(conn, "status", status)
+    except Exception:
+        conn.close()
+        raise
+    return exportar(conn, formato, credores, status_titulo, mes_ano or None)
+
+
+def get_dashboard(
+        credor: Optional[str] = None,
+        status: Optional[str] = None,
+        mes_ano: Optional[str] = None,
+        page: int = 1,
+        limit: int = 10,
+        top: Optional[int] = None
+) -> Dict[str, Any]:
+    """Opções de filtro, página do resumo, totais e séries do dashboard numa única consulta"""
+    credor, status = normalizar_filtro(credor), normalizar_filtro(status)
+    mes_ano = mes_ano or None
+    chave = ("dashboard", credor, status, mes_ano, page, limit, top)
+
+    def consultar():
         conn = get_db_connection()
+        return get_snapshot().painel(
+            resolver_filtro(conn, "credor", credor),
+            resolver_filtro(conn, "status", status),
+            mes_ano, page, limit, top
+        )
 
-        # Total por status
-        status_query = """
-        SELECT STATUS_TITULO, SUM(QUANTIDADE) as total_registros, SUM(VALOR_TOTAL) as total_valor
-        FROM resumo_mensal 
-        GROUP BY STATUS_TITULO
-        """
-        status_data = pd.read_sql_query(status_query, conn)
-
-        # Total por credor
-        credor_query = """
-        SELECT CREDOR, SUM(QUANTIDADE) as total_registros, SUM(VALOR_TOTAL) as total_valor
-        FROM resumo_mensal 
-        GROUP BY CREDOR
-        """
-        credor_data = pd.read_sql_query(credor_query, conn)
-
-        # Totais gerais
-        total_query = """
-        SELECT 
-            SUM(QUANTIDADE) as total_registros,
-            SUM(VALOR_TOTAL) as total_valor,
-            COUNT(DISTINCT MES_ANO) as total_meses,
-            COUNT(DISTINCT CREDOR) as total_credores
-        FROM resumo_mensal
-        """
-        totais = pd.read_sql_query(total_query, conn).iloc[0].to_dict()
+    return cache_resultados.obter(chave, get_db_version(), consultar)
 
-        conn.close()
+
+def get_series(
+        credor: Optional[str] = None,
+        status: Optional[str] = None,
+        mes_ano: Optional[str] = None,
+        top: Optional[int] = None
+) -> Dict[str, Any]:
+    """Totais e séries dos gráficos (por mês e por credor) para os filtros informados"""
+    credor, status = normalizar_filtro(credor), normalizar_filtro(status)
+    mes_ano = mes_ano or None
+    chave = ("series", credor, status, mes_ano, top)
+
+    def consultar():
+        conn = get_db_connection()
+        return get_snapshot().series(
+            resolver_filtro(conn, "credor", credor),
+            resolver_filtro(conn, "status", status),
+            mes_ano, top
+        )
+
+    return cache_resultados.obter(chave, get_db_version(), consultar)
+
+
+def get_resumo_aggregations() -> Dict[str, Any]:
+    """Retorna agregações totais do resumo"""
+    return cache_resultados.obter(("aggregations",), get_db_version(), _calcular_aggregations)
+
+
+def _calcular_aggregations() -> Dict[str, Any]:
+    try:
+        conn = get_db_connection()
+        try:
+            consultas = CONSULTAS_ROLLUP
+            totais = conn.execute(consultas["totais_gerais"]).fetchone()
+        except sqlite3.OperationalError:
+            # Banco publicado antes das tabelas de agregação: calcular a partir de resumo_mensal
+            logger.warning("Tabelas de agregação ausentes; calculando a partir de resumo_mensal")
+            consultas = CONSULTAS_AGREGACAO
+            totais = conn.execute(consultas["totais_gerais"]).fetchone()
 
         return {
-            "por_status": status_data.to_dict('records'),
-            "por_credor": credor_data.to_dict('records'),
-            "totais_gerais": totais
+            "por_status": [dict(row) for row in conn.execute(consultas["por_status"])],
+            "por_credor": [dict(row) for row in conn.execute(consultas["por_credor"])],
+            "totais_gerais": dict(totais)
         }
 
     except Exception as e:
@@ -169,12 +311,21 @@ def get_resumo_aggregations() -> Dict[str, Any]:
         raise
 
 
+def get_meses_disponiveis() -> List[str]:
+    """Retorna os meses presentes no resumo, do mais recente para o mais antigo"""
+    return get_snapshot().meses[::-1].tolist()
+
+
+def get_credores_disponiveis() -> List[str]:
+    """Retorna os credores presentes no resumo em ordem alfabética"""
+    return get_snapshot().credores.tolist()
+
+
 def check_database_health() -> bool:
     """Verifica se o banco de dados está acessível"""
     try:
         conn = get_db_connection()
         conn.execute("SELECT 1 FROM resumo_mensal LIMIT 1")
-        conn.close()
         return True
     except:
         return False
\ No newline at end of file
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API: semeia um resumo.bd com um resumo_mensal sintético grande, dispara
+requisições concorrentes (mistura de endpoints e de combinações de filtros configurável) e
+reporta vazão e latência p50/p95/p99 por endpoint, em JSON. Com --baseline, sai com código 1
+se algum endpoint regredir além do limite.
+
+    # App no mesmo processo (httpx + ASGITransport), banco temporário de 500 mil linhas
+    python benchmarks/bench_api.py --linhas-resumo 500000 --saida baseline.json
+
+    # Contra um uvicorn local servindo o banco semeado
+    python benchmarks/bench_api.py --banco /tmp/bench.bd --apenas-semear
+    RESUMO_DB_PATH=/tmp/bench.bd uvicorn api.main:app --workers 4
+    python benchmarks/bench_api.py --url http://localhost:8000 --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "data"))
+
+from etl import ETLProcessor  # noqa: E402
+
+# Nome na linha de comando -> caminho do endpoint
+ENDPOINTS = {
+    "resumo": "/resumo",
+    "aggregations": "/resumo/aggregations",
+    "meses": "/resumo/meses",
+    "credores": "/resumo/credores",
+    "health": "/health",
+    "dashboard": "/dashboard",
+    "series": "/resumo/series",
+}
+
+MIX_PADRAO = "resumo=6,aggregations=1,meses=1,credores=1,health=1"
+
+# Combinações de filtros sorteadas para /resumo, /dashboard e /resumo/series
+FILTROS_PADRAO = "nenhum,mes_ano,credor,status,credor+status,mes_ano+credor,mes_ano+status"
+
+PREFIXOS_CREDOR = ["Banco", "Financeira", "Cooperativa", "Comércio", "Serviços", "Crédito"]
+STATUS = ["Pago", "Pendente", "Vencido"]
+TRECHOS_STATUS = ["pag", "pend", "venc", "o"]
+
+MESES = 60
+
+
+def semear_banco(caminho, linhas, semente=42):
+    """
+    Cria `caminho` com um resumo_mensal sintético de `linhas` linhas (60 meses x 3 status x
+    credores suficientes), gravado por `ETLProcessor.load_to_database` com índices, rollups e
+    índice de busca, como numa carga real.
+    """
+    rng = np.random.default_rng(semente)
+    n_credores = max(1, math.ceil(linhas / (MESES * len(STATUS))))
+
+    meses = pd.period_range("2020-01", periods=MESES, freq="M").astype(str)
+    credores = [f"{PREFIXOS_CREDOR[n % len(PREFIXOS_CREDOR)]} {n:06d}" for n in range(n_credores)]
+
+    # Subconjunto aleatório das combinações (mês, credor, status), na ordem da chave
+    total = MESES * n_credores * len(STATUS)
+    escolhidas = np.sort(rng.choice(total, size=min(linhas, total), replace=False))
+    mes, resto = np.divmod(escolhidas, n_credores * len(STATUS))
+    credor, status = np.divmod(resto, len(STATUS))
+
+    quantidade = rng.integers(1, 500, size=len(escolhidas))
+    valor_total = np.round(quantidade * rng.lognormal(6, 1, size=len(escolhidas)), 2)
+    df_resumo = pd.DataFrame({
+        "MES_ANO": np.asarray(meses)[mes],
+        "CREDOR": np.asarray(credores, dtype=object)[credor],
+        "STATUS_TITULO": np.asarray(STATUS, dtype=object)[status],
+        "QUANTIDADE": quantidade,
+        "VALOR_TOTAL": valor_total,
+        "VALOR_MEDIO": np.round(valor_total / quantidade, 2),
+    }).sort_values(["MES_ANO", "CREDOR", "STATUS_TITULO"], ignore_index=True)
+
+    caminho = Path(caminho).resolve()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    if caminho.exists():
+        caminho.unlink()
+
+    with tempfile.TemporaryDirectory(prefix="bench_api_") as tmp:
+        cwd = os.getcwd()
+        # load_to_database cria "data/" relativo ao diretório atual
+        os.chdir(tmp)
+        try:
+            ETLProcessor(output_db=str(caminho), output_parquet=None).load_to_database(df_resumo)
+        finally:
+            os.chdir(cwd)
+
+    return len(df_resumo)
+
+
+def ler_mix(texto):
+    """"resumo=6,health=1" -> {"resumo": 6.0, "health": 1.0}"""
+    mix = {}
+    for item in texto.split(","):
+        nome, _, peso = item.partition("=")
+        nome = nome.strip()
+        if nome not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Endpoint desconhecido: {nome} (use {', '.join(ENDPOINTS)})")
+        mix[nome] = float(peso or 1)
+    return mix
+
+
+def ler_filtros(texto):
+    """"nenhum,credor+status" -> [(), ("credor", "status")]"""
+    combinacoes = []
+    for item in texto.split(","):
+        campos = () if item.strip() == "nenhum" else tuple(c.strip() for c in item.split("+"))
+        for campo in campos:
+            if campo not in ("credor", "status", "mes_ano"):
+                raise argparse.ArgumentTypeError(f"Filtro desconhecido: {campo}")
+        combinacoes.append(campos)
+    return combinacoes
+
+
+class PlanoRequisicoes:
+    """Sorteia (endpoint, parâmetros) segundo o mix de endpoints e as combinações de filtros"""
+
+    def __init__(self, mix, filtros, meses, credores, semente=42):
+        self.rng = random.Random(semente)
+        self.nomes = list(mix)
+        self.pesos = list(mix.values())
+        self.filtros = filtros
+        self.meses = meses
+        self.credores = credores
+
+    def _trecho_credor(self):
+        credor = self.rng.choice(self.credores)
+        if self.rng.random() < 0.3:
+            return credor.split()[0].lower()  # prefixo: muitos credores
+        inicio = self.rng.randrange(max(1, len(credor) - 4))
+        return credor[inicio:inicio + self.rng.randint(4, 8)]
+
+    def _parametros(self, nome):
+        params = {}
+        for campo in self.rng.choice(self.filtros):
+            if campo == "credor" and self.credores:
+                params["credor"] = self._trecho_credor()
+            elif campo == "status":
+                params["status"] = self.rng.choice(TRECHOS_STATUS)
+            elif campo == "mes_ano" and self.meses:
+                params["mes_ano"] = self.rng.choice(self.meses)
+
+        if nome in ("resumo", "dashboard"):
+            params["limit"] = self.rng.choice((10, 50, 100))
+            params["page"] = self.rng.choice((1, 1, 1, 2, 3, 10))
+        if nome in ("dashboard", "series"):
+            params["top"] = 15
+        return params
+
+    def proxima(self):
+        nome = self.rng.choices(self.nomes, weights=self.pesos)[0]
+        params = self._parametros(nome) if nome in ("resumo", "dashboard", "series") else {}
+        return nome, ENDPOINTS[nome], params
+
+
+async def _valores_filtro(cliente):
+    """Meses e credores disponíveis, lidos da própria API"""
+    meses = (await cliente.get("/resumo/meses")).json().get("meses", [])
+    credores = (await cliente.get("/resumo/credores")).json().get("credores", [])
+    return meses, credores
+
+
+async def executar_carga(cliente, plano, concorrencia, requisicoes=None, duracao=None):
+    """
+    Dispara requisições com `concorrencia` clientes simultâneos até completar `requisicoes`
+    ou esgotar `duracao` segundos. Retorna ([(endpoint, segundos, status_code)], segundos totais).
+    """
+    medidas = []
+    restantes = [requisicoes]
+    inicio = time.perf_counter()
+    fim = inicio + duracao if duracao else None
+
+    async def cliente_virtual():
+        while True:
+            if fim is not None and time.perf_counter() >= fim:
+                return
+            if restantes[0] is not None:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+
+            nome, caminho, params = plano.proxima()
+            t0 = time.perf_counter()
+            try:
+                resposta = await cliente.get(caminho, params=params)
+                codigo = resposta.status_code
+            except httpx.HTTPError:
+                codigo = None
+            medidas.append((nome, time.perf_counter() - t0, codigo))
+
+    await asyncio.gather(*(cliente_virtual() for _ in range(concorrencia)))
+    return medidas, time.perf_counter() - inicio
+
+
+def resumir(medidas, segundos):
+    """Vazão e percentis de latência (ms) por endpoint e no geral"""
+    grupos = {}
+    for nome, duracao, codigo in medidas:
+        grupos.setdefault(nome, []).append((duracao, codigo))
+    grupos["total"] = [(duracao, codigo) for _, duracao, codigo in medidas]
+
+    endpoints = {}
+    for nome, amostras in grupos.items():
+        latencias = np.array([d for d, _ in amostras]) * 1000
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99]) if len(latencias) else (0, 0, 0)
+        endpoints[nome] = {
+            "requisicoes": len(amostras),
+            "erros": sum(1 for _, codigo in amostras if codigo is None or codigo >= 500),
+            "vazao_rps": round(len(amostras) / segundos, 1) if segundos else None,
+            "latencia_ms": {
+                "p50": round(float(p50), 2),
+                "p95": round(float(p95), 2),
+                "p99": round(float(p99), 2),
+                "media": round(float(latencias.mean()), 2) if len(latencias) else 0,
+                "max": round(float(latencias.max()), 2) if len(latencias) else 0,
+            },
+        }
+    return endpoints
+
+
+def comparar(resultado, baseline, limite, minimo_ms):
+    """
+    Lista as regressões em relação a `baseline`: percentis de latência mais de `limite` (fração)
+    acima do baseline, ignorando diferenças menores que `minimo_ms`, e vazão mais de `limite`
+    abaixo.
+    """
+    regressoes = []
+    for nome, atual in resultado["endpoints"].items():
+        anterior = baseline.get("endpoints", {}).get(nome)
+        if anterior is None:
+            continue
+        for percentil in ("p50", "p95", "p99"):
+            antes, depois = anterior["latencia_ms"][percentil], atual["latencia_ms"][percentil]
+            if depois - antes > minimo_ms and depois > antes * (1 + limite):
+                regressoes.append(f"{nome} {percentil}: {antes} ms → {depois} ms (+{depois / antes - 1:.0%})")
+        antes, depois = anterior.get("vazao_rps"), atual.get("vazao_rps")
+        if antes and depois is not None and depois < antes * (1 - limite):
+            regressoes.append(f"{nome} vazão: {antes} → {depois} req/s ({depois / antes - 1:.0%})")
+    return regressoes
+
+
+async def executar_benchmark(args, url=None, app=None):
+    """Aquece a API, roda a carga e monta o resultado"""
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    if url:
+        cliente = httpx.AsyncClient(base_url=url, limits=limites, timeout=args.timeout)
+    else:
+        cliente = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout
+        )
+
+    async with cliente:
+        meses, credores = await _valores_filtro(cliente)
+        plano = PlanoRequisicoes(args.mix, args.filtros, meses, credores, args.semente)
+
+        if args.aquecimento:
+            await executar_carga(cliente, plano, args.concorrencia, requisicoes=args.aquecimento)
+
+        medidas, segundos = await executar_carga(
+            cliente, plano, args.concorrencia,
+            requisicoes=None if args.duracao else args.requisicoes, duracao=args.duracao
+        )
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "alvo": url or "in-process",
+        "banco": None if url else os.environ.get("RESUMO_DB_PATH"),
+        "concorrencia": args.concorrencia,
+        "mix": args.mix,
+        "filtros": ["+".join(c) or "nenhum" for c in args.filtros],
+        "segundos": round(segundos, 3),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "endpoints": resumir(medidas, segundos),
+    }
+
+
+def _imprimir(resultado):
+    print(f"\n{resultado['alvo']}: concorrência {resultado['concorrencia']}, {resultado['segundos']}s")
+    print(f"{'endpoint':<14} {'reqs':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for nome, m in resultado["endpoints"].items():
+        lat = m["latencia_ms"]
+        print(f"{nome:<14} {m['requisicoes']:>7} {m['erros']:>6} {m['vazao_rps']:>8} "
+              f"{lat['p50']:>8} {lat['p95']:>8} {lat['p99']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga dos endpoints da API")
+    parser.add_argument("--url", default=None,
+                        help="API em execução (ex.: http://localhost:8000); sem ela, a app roda no mesmo processo")
+    parser.add_argument("--banco", default=None,
+                        help="resumo.bd do teste; é semeado se não existir (padrão: arquivo temporário)")
+    parser.add_argument("--linhas-resumo", type=int, default=200_000,
+                        help="Linhas do resumo_mensal sintético (padrão 200000)")
+    parser.add_argument("--recriar", action="store_true", help="Semeia o banco mesmo que ele já exista")
+    parser.add_argument("--apenas-semear", action="store_true", help="Só semeia --banco e sai")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Clientes simultâneos (padrão 16)")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Requisições medidas (padrão 2000)")
+    parser.add_argument("--duracao", type=float, default=None,
+                        help="Mede por N segundos em vez de um número fixo de requisições")
+    parser.add_argument("--aquecimento", type=int, default=100,
+                        help="Requisições iniciais fora da medição (padrão 100)")
+    parser.add_argument("--mix", type=ler_mix, default=ler_mix(MIX_PADRAO),
+                        help=f"Pesos dos endpoints (padrão {MIX_PADRAO}); "
+                             f"disponíveis: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--filtros", type=ler_filtros, default=ler_filtros(FILTROS_PADRAO),
+                        help=f"Combinações de filtros sorteadas (padrão {FILTROS_PADRAO})")
+    parser.add_argument("--semente", type=int, default=42, help="Semente dos dados e do sorteio")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição, em segundos")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do resultado")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.2,
+                        help="Regressão tolerada, em fração do baseline (padrão 0.2)")
+    parser.add_argument("--minimo-ms", type=float, default=1.0,
+                        help="Diferença de latência ignorada na comparação (padrão 1 ms)")
+    args = parser.parse_args()
+
+    if args.concorrencia < 1:
+        parser.error(f"--concorrencia deve ser positiva: {args.concorrencia}")
+    if args.apenas_semear and not args.banco:
+        parser.error("--apenas-semear exige --banco")
+
+    # O log por requisição (httpx, API) pesaria na medição
+    for nome in ("etl", "httpx", "api"):
+        logging.getLogger(nome).setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench_api_banco_") as tmp:
+        app = None
+        if args.banco or not args.url:
+            banco = Path(args.banco or Path(tmp) / "resumo.bd")
+            if args.recriar or not banco.exists():
+                print(f"Semeando {banco} com {args.linhas_resumo} linhas...")
+                semear_banco(banco, args.linhas_resumo, args.semente)
+            if args.apenas_semear:
+                print(f"✅ Banco pronto: RESUMO_DB_PATH={banco.resolve()}")
+                sys.exit(0)
+
+        if not args.url:
+            # A API lê RESUMO_DB_PATH ao ser importada
+            os.environ["RESUMO_DB_PATH"] = str(banco.resolve())
+            from api.main import app
+
+        try:
+            resultado = asyncio.run(executar_benchmark(args, url=args.url, app=app))
+        except httpx.HTTPError as e:
+            print(f"❌ API indisponível em {args.url}: {e}")
+            sys.exit(2)
+
+    _imprimir(resultado)
+
+    if args.saida:
+        Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResultado gravado em {args.saida}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        for chave in ("concorrencia", "mix", "filtros"):
+            if baseline.get(chave) != resultado[chave]:
+                print(f"⚠️ Baseline com {chave} diferente: {baseline.get(chave)} (agora {resultado[chave]})")
+        regressoes = comparar(resultado, baseline, args.limite, args.minimo_ms)
+        if regressoes:
+            print(f"\n❌ Regressões acima de {args.limite:.0%}:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            sys.exit(1)
+        print(f"\n✅ Nenhum endpoint regrediu mais de {args.limite:.0%} em relação ao baseline")
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ponta a ponta do pipeline: mede o tempo e o pico de memória de cada etapa de
+`processar_csv` e de `ETLProcessor.run_etl` (pelo relatório da execução) sobre um CSV sintético,
+grava o resultado em JSON e, com --baseline, falha (código de saída 1) quando alguma etapa
+regride além do limite.
+
+    python benchmarks/bench_pipeline.py --linhas 1m --saida resultado.json
+    python benchmarks/bench_pipeline.py --linhas 1m --baseline resultado.json --limite 0.2
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "data"))
+
+import pandas as pd  # noqa: E402
+
+from gerar_dados import gerar_csv, quantidade_linhas  # noqa: E402
+from processador_csv import processar_csv  # noqa: E402
+from etl import ETLProcessor  # noqa: E402
+from instrumentacao import PerfilExecucao, pico_rss_mb, reiniciar_pico_rss  # noqa: E402
+
+
+class Medidor:
+    """
+    Registra a duração e o pico de memória residente (RSS) de cada etapa. O RSS cobre também
+    os buffers do Arrow, que o tracemalloc não enxerga; onde o pico não pode ser zerado entre
+    etapas (fora do Linux), o valor é o pico do processo até o fim da etapa.
+    """
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        reiniciar_pico_rss()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nome] = {
+                "segundos": time.perf_counter() - inicio,
+                "pico_rss_mb": pico_rss_mb(),
+            }
+
+
+def executar_pipeline(csv_bruto, dir_trabalho, medidor, chunksize=None, workers=None, perfil=False):
+    """
+    Executa `processar_csv` e `run_etl` (carga completa, com publicação do banco e dos datasets,
+    agregações e índice de busca), gravando em `dir_trabalho`. Cada um entra pelo total
+    ("processar_csv", "run_etl") e pelas suas etapas ("processar_csv.*", "run_etl.*"): leitura,
+    reconstrução das linhas, formatação de cada coluna, VALOR e gravação; extract, groupby etc.
+    Com `perfil`, run_etl roda sob cProfile e tracemalloc e as etapas ganham o pico de memória
+    alocada pelo Python ("pico_tracemalloc_mb").
+    """
+    csv_formatado = dir_trabalho / "dados_cobranca_formatado.csv"
+
+    perfil_csv = PerfilExecucao("processar_csv")
+    with medidor.etapa("processar_csv"):
+        processar_csv(chunksize=chunksize, input_path=csv_bruto, output_path=csv_formatado, workers=workers,
+                      perfil_execucao=perfil_csv)
+    relatorio_csv = perfil_csv.relatorio(sucesso=True)
+    for nome, medida in relatorio_csv["etapas"].items():
+        medidor.etapas[f"processar_csv.{nome}"] = _medida(medida)
+    # Cada etapa interna zera o pico do processo: o pico do total é o maior entre elas
+    medidor.etapas["processar_csv"]["pico_rss_mb"] = max(
+        (pico for pico in (medidor.etapas["processar_csv"]["pico_rss_mb"], relatorio_csv["pico_rss_mb"])
+         if pico is not None),
+        default=None,
+    )
+
+    etl = ETLProcessor(
+        input_file=str(csv_formatado),
+        output_db=str(dir_trabalho / "resumo.bd"),
+        output_csv=str(dir_trabalho / "resumo_mensal.csv"),
+        output_parquet=str(dir_trabalho / "parquet"),
+        output_relatorio=None,
+    )
+    reiniciar_pico_rss()
+    if etl.run_etl(perfil=perfil) is None:
+        raise RuntimeError(f"run_etl falhou: {etl.ultimo_relatorio['erro']}")
+
+    relatorio = etl.ultimo_relatorio
+    medidor.etapas["run_etl"] = _medida(relatorio)
+    for nome, medida in relatorio["etapas"].items():
+        medidor.etapas[f"run_etl.{nome}"] = _medida(medida)
+
+    return {"registros": relatorio["registros_entrada"], "linhas_resumo": relatorio["linhas_resumo"]}
+
+
+def _medida(medida):
+    """Métricas do benchmark de uma etapa de um relatório de PerfilExecucao"""
+    resultado = {"segundos": medida["segundos"], "pico_rss_mb": medida["pico_rss_mb"]}
+    if medida.get("pico_tracemalloc_mb") is not None:
+        resultado["pico_tracemalloc_mb"] = medida["pico_tracemalloc_mb"]
+    return resultado
+
+
+# Etapas que somadas dão o tempo do pipeline (as demais são partes delas)
+ETAPAS_TOTAL = ("processar_csv", "run_etl")
+
+
+def executar_benchmark(csv_bruto, repeticoes=3, chunksize=None, workers=None, perfil=False):
+    """
+    Roda o pipeline `repeticoes` vezes. O tempo de cada etapa é a mediana das execuções e o
+    pico de memória, o maior observado.
+    """
+    medidas = {}
+    contagens = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        cwd = os.getcwd()
+        # As etapas de carga criam "data/" relativo ao diretório atual
+        os.chdir(tmp)
+        try:
+            for n in range(repeticoes):
+                medidor = Medidor()
+                contagens = executar_pipeline(csv_bruto, Path(tmp), medidor, chunksize, workers, perfil)
+                for nome, medida in medidor.etapas.items():
+                    medidas.setdefault(nome, []).append(medida)
+                print(f"Execução {n + 1}/{repeticoes}: "
+                      f"{sum(medidor.etapas[nome]['segundos'] for nome in ETAPAS_TOTAL):.2f}s")
+        finally:
+            os.chdir(cwd)
+
+    etapas = {}
+    for nome, execucoes in medidas.items():
+        segundos = [m["segundos"] for m in execucoes]
+        picos = [m["pico_rss_mb"] for m in execucoes if m["pico_rss_mb"] is not None]
+        etapas[nome] = {
+            "segundos": round(statistics.median(segundos), 4),
+            "segundos_execucoes": [round(s, 4) for s in segundos],
+            "pico_rss_mb": round(max(picos), 1) if picos else None,
+        }
+        picos_tracemalloc = [m["pico_tracemalloc_mb"] for m in execucoes if "pico_tracemalloc_mb" in m]
+        if picos_tracemalloc:
+            etapas[nome]["pico_tracemalloc_mb"] = round(max(picos_tracemalloc), 1)
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "arquivo": str(csv_bruto),
+        "bytes_arquivo": Path(csv_bruto).stat().st_size,
+        **contagens,
+        "repeticoes": repeticoes,
+        "chunksize": chunksize,
+        "workers": workers,
+        "perfil": perfil,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "segundos_total": round(sum(etapas[nome]["segundos"] for nome in ETAPAS_TOTAL), 4),
+        "etapas": etapas,
+    }
+
+
+def comparar(resultado, baseline, limite, minimo_segundos, minimo_mb):
+    """
+    Lista as regressões de `resultado` em relação a `baseline`: etapas cujo tempo (ou pico de
+    memória) ficou mais de `limite` (fração) acima do baseline. Diferenças absolutas menores
+    que `minimo_segundos`/`minimo_mb` são ignoradas, pois em etapas curtas são só ruído.
+    """
+    regressoes = []
+    for nome, atual in resultado["etapas"].items():
+        anterior = baseline.get("etapas", {}).get(nome)
+        if anterior is None:
+            continue
+        for metrica, minimo in (("segundos", minimo_segundos), ("pico_rss_mb", minimo_mb)):
+            if atual.get(metrica) is None or anterior.get(metrica) is None:
+                continue
+            antes, depois = anterior[metrica], atual[metrica]
+            if depois - antes > minimo and depois > antes * (1 + limite):
+                variacao = (depois / antes - 1) if antes else float("inf")
+                regressoes.append(f"{nome} ({metrica}): {antes} → {depois} (+{variacao:.0%})")
+    return regressoes
+
+
+def _imprimir(resultado):
+    print(f"\n{resultado['registros']} registros, {resultado['linhas_resumo']} linhas no resumo")
+    print(f"{'etapa':<36} {'segundos':>10} {'pico RSS MiB':>14}")
+    for nome, medida in resultado["etapas"].items():
+        pico = medida["pico_rss_mb"]
+        print(f"{nome:<36} {medida['segundos']:>10.3f} {'' if pico is None else f'{pico:.1f}':>14}")
+    print(f"{'total':<36} {resultado['segundos_total']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark por etapa de processar_csv e run_etl")
+    parser.add_argument("--entrada", default=None,
+                        help="CSV bruto a usar; sem ele, um arquivo sintético é gerado")
+    parser.add_argument("--linhas", type=quantidade_linhas, default=100_000,
+                        help="Linhas do CSV sintético: 100k, 1m, 10m ou um número (padrão 100k)")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do CSV sintético")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções medidas (padrão 3)")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="processar_csv em blocos de N linhas (modo streaming)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processar_csv em N processos (modo paralelo)")
+    parser.add_argument("--perfil", action="store_true",
+                        help="run_etl sob cProfile e tracemalloc: memória alocada por etapa, tempos inflados")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do resultado")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.2,
+                        help="Regressão tolerada por etapa, em fração do baseline (padrão 0.2)")
+    parser.add_argument("--minimo-segundos", type=float, default=0.05,
+                        help="Diferença de tempo ignorada na comparação (padrão 0.05s)")
+    parser.add_argument("--minimo-mb", type=float, default=20.0,
+                        help="Diferença de memória ignorada na comparação (padrão 20 MiB)")
+    args = parser.parse_args()
+
+    if args.repeticoes < 1:
+        parser.error(f"--repeticoes deve ser positivo: {args.repeticoes}")
+
+    # O log de cada etapa do ETL poluiria a saída (e o tempo) do benchmark
+    logging.getLogger("etl").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory(prefix="bench_dados_") as tmp_dados:
+        if args.entrada:
+            csv_bruto = Path(args.entrada).resolve()
+        else:
+            print(f"Gerando CSV sintético com {args.linhas} linhas...")
+            csv_bruto = gerar_csv(args.linhas, Path(tmp_dados) / "dados_cobranca.csv", args.semente)
+
+        resultado = executar_benchmark(csv_bruto, args.repeticoes, args.chunksize, args.workers, args.perfil)
+        resultado["linhas_geradas"] = None if args.entrada else args.linhas
+
+    _imprimir(resultado)
+
+    if args.saida:
+        Path(args.saida).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.saida).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResultado gravado em {args.saida}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("registros") != resultado["registros"]:
+            print(f"⚠️ Baseline com {baseline.get('registros')} registros; "
+                  f"esta execução tem {resultado['registros']}")
+
+        regressoes = comparar(resultado, baseline, args.limite, args.minimo_segundos, args.minimo_mb)
+        if regressoes:
+            print(f"\n❌ Regressões acima de {args.limite:.0%}:")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            sys.exit(1)
+        print(f"\n✅ Nenhuma etapa regrediu mais de {args.limite:.0%} em relação ao baseline")
+
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Gera arquivos dados_cobranca.csv sintéticos, com a mesma sujeira que o pré-processamento
+(data/processador_csv.py) trata: header C#EDOR, delimitadores "," e ";" misturados, valores
+"1.000,00" e "2,500.50", layouts de data diferentes, sinônimos de status e linhas vazias.
+"""
+
+import argparse
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+HEADER = "C#EDOR,CAMPANHA,CLIENTE,DATA_CADASTRO,DATA_PAGAMENTO,STATUS_TITULO,VALOR"
+
+# Tamanhos usuais dos benchmarks
+TAMANHOS = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Linhas geradas e gravadas por vez: a memória usada não depende do tamanho do arquivo
+LINHAS_POR_BLOCO = 100_000
+
+N_CREDORES = 40
+N_CAMPANHAS = 12
+N_CLIENTES = 200_000
+
+DATA_INICIAL = date(2022, 1, 1)
+DIAS = 3 * 365
+
+MESES_EN = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# (grafia, peso): sinônimos e variações de caixa/espaços encontrados na origem
+STATUS = [
+    ("Pago", 20), (" Pago ", 4), ("pago", 4), ("PAGO", 2), ("paid", 3), ("Liquidado", 3),
+    ("Vencido", 14), ("vencido ", 3), ("overdue", 3),
+    ("Pendente", 14), ("pendente", 3), ("pending", 3), ("", 2),
+]
+
+
+def _variacoes_credor(nome):
+    return [nome, nome.lower(), f"{nome.lower()} ", f" {nome}", nome.upper()]
+
+
+def _formatar_data(dia, layout):
+    if layout == 0:
+        return dia.isoformat()                                 # 2023-01-15
+    if layout == 1:
+        return dia.strftime("%d/%m/%Y")                        # 15/01/2023
+    return f"{MESES_EN[dia.month - 1]} {dia.day} {dia.year}"   # Jan 15 2023
+
+
+def _formatar_valor(centavos, estilo):
+    inteiro, cents = divmod(centavos, 100)
+    if estilo == 0:
+        return f"{inteiro:,}".replace(",", ".") + f",{cents:02d}"   # 1.000,00
+    if estilo == 1:
+        return f"{inteiro:,}.{cents:02d}"                           # 2,500.50
+    if estilo == 2:
+        return f"{inteiro}.{cents:02d}"                             # 1000.00
+    if estilo == 3:
+        return f"{inteiro},{cents:02d}"                             # 300,00
+    if estilo == 4:
+        return str(inteiro)                                         # 500
+    return ""                                                       # valor ausente
+
+
+class GeradorCobrancas:
+    """Gera linhas brutas de cobrança de forma determinística a partir de `semente`"""
+
+    def __init__(self, semente=42):
+        self.rng = random.Random(semente)
+
+        self.credores = [
+            variacao
+            for n in range(N_CREDORES)
+            for variacao in _variacoes_credor(f"Credor {n + 1:02d}")
+        ]
+        self.campanhas = [
+            grafia
+            for n in range(1, N_CAMPANHAS + 1)
+            for grafia in (f"Campanha{n}", f"campanha {n}", f"CAMPANHA{n}")
+        ]
+        self.status, self.pesos_status = zip(*STATUS)
+
+        # Datas pré-formatadas em cada layout: a geração das linhas só escolhe índices
+        self.datas = [
+            [_formatar_data(DATA_INICIAL + timedelta(days=d), layout) for d in range(DIAS + 90)]
+            for layout in range(3)
+        ]
+
+    def _cliente(self):
+        n = self.rng.randrange(N_CLIENTES)
+        forma = self.rng.random()
+        if forma < 0.6:
+            return f"Cliente{n}"
+        if forma < 0.9:
+            return f"cliente {n}"
+        return f"Cliente{chr(65 + n % 26)}"
+
+    def _delimitar(self, campos):
+        """Junta os campos com ",", com ";" ou com os dois misturados"""
+        tipo = self.rng.random()
+        if tipo < 0.7:
+            return ",".join(campos)
+        if tipo < 0.9:
+            return ";".join(campos)
+        return "".join(
+            campo + (self.rng.choice(",;") if i < len(campos) - 1 else "")
+            for i, campo in enumerate(campos)
+        )
+
+    def linha(self):
+        rng = self.rng
+
+        # Linhas vazias e truncadas (descartadas pelo pré-processamento)
+        sorteio = rng.random()
+        if sorteio < 0.002:
+            return ""
+        if sorteio < 0.003:
+            return f"{rng.choice(self.credores)},{rng.choice(self.campanhas)}"
+
+        layout = rng.choices((0, 1, 2), weights=(6, 3, 1))[0]
+        cadastro = rng.randrange(DIAS)
+        pagamento = (
+            self.datas[layout][cadastro + rng.randrange(90)] if rng.random() < 0.8 else ""
+        )
+
+        # Centavos com distribuição assimétrica: muitos títulos pequenos, poucos grandes
+        centavos = int(rng.lognormvariate(11, 1.2))
+        estilo = rng.choices(range(6), weights=(25, 15, 30, 10, 15, 5))[0]
+        if estilo == 1 and centavos < 100_000:
+            estilo = 2  # "2,500.50" só aparece com separador de milhar
+
+        return self._delimitar([
+            rng.choice(self.credores),
+            rng.choice(self.campanhas),
+            self._cliente(),
+            self.datas[layout][cadastro],
+            pagamento,
+            rng.choices(self.status, weights=self.pesos_status)[0],
+            _formatar_valor(centavos, estilo),
+        ])
+
+    def linhas(self, quantidade):
+        for _ in range(quantidade):
+            yield self.linha()
+
+
+def gerar_csv(linhas, output_path="dados_cobranca.csv", semente=42):
+    """Grava `linhas` linhas de dados (além do header) em `output_path`; retorna o caminho"""
+    out_path = Path(output_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    gerador = GeradorCobrancas(semente)
+
+    with open(out_path, "w", encoding="utf-8", newline="") as out:
+        out.write(HEADER + "\n")
+        restantes = linhas
+        while restantes > 0:
+            bloco = min(restantes, LINHAS_POR_BLOCO)
+            out.write("\n".join(gerador.linhas(bloco)) + "\n")
+            restantes -= bloco
+
+    return out_path
+
+
+def quantidade_linhas(valor):
+    """Aceita um tamanho nomeado (100k, 1m, 10m) ou um número de linhas"""
+    return TAMANHOS.get(valor.lower()) or int(valor.replace("_", ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um dados_cobranca.csv sintético com dados sujos")
+    parser.add_argument("--linhas", type=quantidade_linhas, default=TAMANHOS["100k"],
+                        help="Quantidade de linhas: 100k, 1m, 10m ou um número (padrão 100k)")
+    parser.add_argument("--saida", default="dados_cobranca.csv", help="Arquivo de saída")
+    parser.add_argument("--semente", type=int, default=42, help="Semente do gerador aleatório")
+    args = parser.parse_args()
+
+    caminho = gerar_csv(args.linhas, args.saida, args.semente)
+    print(f"✅ {args.linhas} linhas geradas em {caminho} ({caminho.stat().st_size / 2**20:.1f} MiB)")
@@ -2,58 +2,398 @@ import pandas as pd
 import numpy as np
 import sqlite3
 from datetime import datetime
+from contextlib import contextmanager
+import argparse
+import hashlib
+import io
+import json
 import logging
+import os
+import shutil
+import time
+import uuid
 from pathlib import Path
-import re
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from valores import parse_valor_brasileiro, parse_valores, formatar_valores
+from instrumentacao import PerfilExecucao, etapa_opcional
+
+# Bytes finais do trecho já processado usados na assinatura do arquivo de entrada
+BLOCO_ASSINATURA = 1024 * 1024
+
+# Datasets Parquet particionados por mês (diretórios MES_ANO=YYYY-MM)
+PARTICIONAMENTO = ds.partitioning(pa.schema([('MES_ANO', pa.string())]), flavor='hive')
+
+SCHEMA_DETALHE = pa.schema([
+    ('CREDOR', pa.string()),
+    ('CAMPANHA', pa.string()),
+    ('CLIENTE', pa.string()),
+    ('DATA_CADASTRO', pa.date32()),
+    ('DATA_PAGAMENTO', pa.date32()),
+    ('STATUS_TITULO', pa.string()),
+    ('VALOR', pa.float64()),
+    ('MES_ANO', pa.string()),
+])
+
+COLUNAS_RESUMO = ['MES_ANO', 'CREDOR', 'STATUS_TITULO', 'QUANTIDADE', 'VALOR_TOTAL', 'VALOR_MEDIO']
+
+CREATE_RESUMO_MENSAL = """
+CREATE TABLE resumo_mensal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    MES_ANO TEXT NOT NULL,
+    CREDOR TEXT NOT NULL,
+    STATUS_TITULO TEXT NOT NULL,
+    QUANTIDADE INTEGER NOT NULL,
+    VALOR_TOTAL REAL NOT NULL,
+    VALOR_MEDIO REAL NOT NULL,
+    DATA_CRIACAO TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+INSERT_RESUMO_MENSAL = f"""
+INSERT INTO resumo_mensal ({', '.join(COLUNAS_RESUMO)})
+VALUES ({', '.join('?' * len(COLUNAS_RESUMO))})
+"""
+
+# A chave única (MES_ANO, CREDOR, STATUS_TITULO) também atende os filtros por MES_ANO
+INDICES_RESUMO_MENSAL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_resumo_chave ON resumo_mensal (MES_ANO, CREDOR, STATUS_TITULO)",
+    "CREATE INDEX IF NOT EXISTS idx_resumo_credor ON resumo_mensal (CREDOR)",
+    "CREATE INDEX IF NOT EXISTS idx_resumo_status ON resumo_mensal (STATUS_TITULO)",
+]
+
+# Agregações servidas por /resumo/aggregations, recalculadas a partir de resumo_mensal a cada carga
+ROLLUPS_RESUMO = [
+    "DROP TABLE IF EXISTS resumo_por_status",
+    """
+    CREATE TABLE resumo_por_status (
+        STATUS_TITULO TEXT PRIMARY KEY,
+        total_registros INTEGER NOT NULL,
+        total_valor REAL NOT NULL
+    )
+    """,
+    """
+    INSERT INTO resumo_por_status
+    SELECT STATUS_TITULO, SUM(QUANTIDADE), ROUND(SUM(VALOR_TOTAL), 2)
+    FROM resumo_mensal
+    GROUP BY STATUS_TITULO
+    """,
+    "DROP TABLE IF EXISTS resumo_por_credor",
+    """
+    CREATE TABLE resumo_por_credor (
+        CREDOR TEXT PRIMARY KEY,
+        total_registros INTEGER NOT NULL,
+        total_valor REAL NOT NULL
+    )
+    """,
+    """
+    INSERT INTO resumo_por_credor
+    SELECT CREDOR, SUM(QUANTIDADE), ROUND(SUM(VALOR_TOTAL), 2)
+    FROM resumo_mensal
+    GROUP BY CREDOR
+    """,
+    "DROP TABLE IF EXISTS resumo_totais",
+    """
+    CREATE TABLE resumo_totais (
+        total_registros INTEGER NOT NULL,
+        total_valor REAL NOT NULL,
+        total_meses INTEGER NOT NULL,
+        total_credores INTEGER NOT NULL
+    )
+    """,
+    """
+    INSERT INTO resumo_totais
+    SELECT COALESCE(SUM(QUANTIDADE), 0), ROUND(COALESCE(SUM(VALOR_TOTAL), 0), 2),
+           COUNT(DISTINCT MES_ANO), COUNT(DISTINCT CREDOR)
+    FROM resumo_mensal
+    """,
+]
+
+# Índice de busca por substring nos filtros de CREDOR e STATUS_TITULO: os valores distintos ficam
+# em termos_busca (com a forma minúscula em VALOR_NORMALIZADO) e num índice FTS5 de trigramas
+CREATE_TERMOS_BUSCA = [
+    "DROP TABLE IF EXISTS termos_busca_fts",
+    "DROP TABLE IF EXISTS termos_busca",
+    """
+    CREATE TABLE termos_busca (
+        CAMPO TEXT NOT NULL,
+        VALOR TEXT NOT NULL,
+        VALOR_NORMALIZADO TEXT NOT NULL,
+        PRIMARY KEY (CAMPO, VALOR)
+    )
+    """,
+    "CREATE INDEX idx_termos_normalizado ON termos_busca (CAMPO, VALOR_NORMALIZADO)",
+]
+
+CREATE_TERMOS_BUSCA_FTS = """
+CREATE VIRTUAL TABLE termos_busca_fts USING fts5(
+    VALOR_NORMALIZADO,
+    content='termos_busca',
+    content_rowid='rowid',
+    tokenize='trigram case_sensitive 1'
+)
+"""
+
+# Colunas de resumo_mensal cobertas pelo índice de busca (CAMPO em termos_busca)
+CAMPOS_BUSCA = {'credor': 'CREDOR', 'status': 'STATUS_TITULO'}
+
+# Histórico das execuções publicadas de run_etl; ETAPAS guarda as métricas de cada etapa em JSON
+CREATE_ETL_EXECUCOES = """
+CREATE TABLE IF NOT EXISTS etl_execucoes (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    INICIO TIMESTAMP NOT NULL,
+    FIM TIMESTAMP NOT NULL,
+    MODO TEXT NOT NULL,
+    SUCESSO INTEGER NOT NULL,
+    ERRO TEXT,
+    SEGUNDOS REAL,
+    CPU_SEGUNDOS REAL,
+    PICO_RSS_MB REAL,
+    REGISTROS_ENTRADA INTEGER,
+    LINHAS_RESUMO INTEGER,
+    ETAPAS TEXT
+)
+"""
+
+# Ajustes para a carga em massa: o banco é recriado por inteiro a cada carga completa
+PRAGMAS_CARGA = [
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA temp_store = MEMORY",
+]
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-class ETLProcessor:
-    def __init__(self):
-        self.input_file = 'dados_cobranca_formatado.csv'
-        self.output_db = 'resumo.bd'
-        self.output_csv = 'resumo_mensal.csv'
+def _publicar_arquivo(staging, destino, tentativas=10):
+    """Grava o staging em disco e o coloca no lugar do destino com os.replace (atômico)"""
+    with open(staging, 'rb+') as f:
+        os.fsync(f.fileno())
 
-    def parse_valor_brasileiro(self, valor_str):
-        """Converte valor no formato brasileiro para float"""
-        if pd.isna(valor_str) or str(valor_str).strip().lower() in ("", "null"):
-            return 0.0
+    for tentativa in range(tentativas):
+        try:
+            os.replace(staging, destino)
+            return
+        except PermissionError:
+            # Windows não substitui arquivos abertos por outro processo; aguardar os leitores
+            if tentativa == tentativas - 1:
+                raise
+            time.sleep(0.1 * (tentativa + 1))
 
-        valor_str = str(valor_str).strip()
 
-        # Remover símbolos e espaços
-        valor_str = re.sub(r'[^\d,.-]', '', valor_str)
+def _vincular_arquivo(origem, destino):
+    """Hard link (os arquivos Parquet nunca são alterados no lugar), ou cópia se não houver suporte"""
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+
+
+def _publicar_datasets(staging, destino):
+    """
+    Coloca cada dataset gravado em `staging` no lugar do correspondente em `destino`; os
+    datasets que a carga não gravou continuam como estão
+    """
+    destino.mkdir(parents=True, exist_ok=True)
+    for dataset in staging.iterdir():
+        publicado = destino / dataset.name
+        anterior = publicado.with_name(f"{publicado.name}.{uuid.uuid4().hex[:8]}.anterior")
+        if publicado.exists():
+            os.replace(publicado, anterior)
+        os.replace(dataset, publicado)
+        shutil.rmtree(anterior, ignore_errors=True)
+
+
+def _linhas_resumo(df_resumo):
+    """Tuplas de tipos Python nativos (aceitos pelo sqlite3) na ordem de COLUNAS_RESUMO"""
+    return zip(*(df_resumo[col].tolist() for col in COLUNAS_RESUMO))
 
-        # Caso: "1.200,50" -> "1200.50"
-        if '.' in valor_str and ',' in valor_str:
-            # Verificar se o ponto é separador de milhar
-            if valor_str.find('.') < valor_str.find(','):
-                valor_str = valor_str.replace('.', '').replace(',', '.')
-            else:
-                valor_str = valor_str.replace(',', '')
-        # Caso: "1.200" (milhar) -> "1200"
-        elif re.match(r'^\d+\.\d{3}$', valor_str):
-            valor_str = valor_str.replace('.', '')
-        # Caso: "1000,50" -> "1000.50"
-        elif ',' in valor_str:
-            valor_str = valor_str.replace(',', '.')
 
+class ETLProcessor:
+    def __init__(self, input_file='dados_cobranca_formatado.csv',
+                 output_db='resumo.bd', output_csv='resumo_mensal.csv',
+                 output_parquet='parquet', output_relatorio='etl_execucao.json'):
+        self.input_file = input_file
+        self.output_db = output_db
+        self.output_csv = output_csv
+        # Diretório dos datasets Parquet (cobrancas/ e resumo_mensal/); None desativa
+        self.output_parquet = output_parquet
+        # Relatório JSON da última execução de run_etl; None desativa
+        self.output_relatorio = output_relatorio
+        # Banco e datasets Parquet em construção durante run_etl; publicados ao final
+        self._banco_staging = None
+        self._parquet_staging = None
+        # Medição das etapas durante run_etl (fora dela, as etapas não são medidas)
+        self.perfil_execucao = None
+        self.ultimo_relatorio = None
+        # Duração e vazão da última load_to_database
+        self.ultima_carga = None
+
+    def _etapa(self, nome, linhas_entrada=None):
+        """Mede um trecho como a etapa `nome` da execução em andamento"""
+        return etapa_opcional(self.perfil_execucao, nome, linhas_entrada)
+
+    def _conectar(self, **kwargs):
+        """Conecta ao banco de destino da carga (staging durante run_etl)"""
+        return sqlite3.connect(self._banco_staging or self.output_db, **kwargs)
+
+    @contextmanager
+    def _publicacao(self):
+        """
+        Direciona as escritas da carga para uma cópia do banco (staging) e para um diretório
+        Parquet de staging e, se tudo der certo, publica o banco sobre output_db com rename
+        atômico e em seguida troca os datasets gravados. Leitores (API) que já estão com o banco
+        aberto continuam lendo a versão anterior; novas conexões abrem a nova versão.
+        """
+        destino = Path(self.output_db)
+        sufixo = f"{uuid.uuid4().hex[:8]}.staging"
+        staging = destino.with_name(f"{destino.name}.{sufixo}")
+        parquet = None if self.output_parquet is None else Path(self.output_parquet)
+        parquet_staging = None if parquet is None else parquet.with_name(f"{parquet.name}.{sufixo}")
+        try:
+            if destino.exists():
+                # Cópia consistente mesmo com leitores ativos (API de backup do SQLite)
+                origem = sqlite3.connect(str(destino))
+                copia = sqlite3.connect(str(staging))
+                try:
+                    origem.backup(copia)
+                finally:
+                    copia.close()
+                    origem.close()
+
+            self._banco_staging = str(staging)
+            self._parquet_staging = parquet_staging
+            yield
+            self._banco_staging = None
+            self._parquet_staging = None
+
+            _publicar_arquivo(staging, destino)
+            logger.info(f"Nova versão do banco publicada em: {destino}")
+
+            if parquet_staging is not None and parquet_staging.exists():
+                _publicar_datasets(parquet_staging, parquet)
+                logger.info(f"Datasets Parquet publicados em: {parquet}")
+        finally:
+            self._banco_staging = None
+            self._parquet_staging = None
+            if staging.exists():
+                staging.unlink()
+            if parquet_staging is not None and parquet_staging.exists():
+                shutil.rmtree(parquet_staging)
+
+    def parse_valor_brasileiro(self, valor_str):
+        """Converte valor no formato brasileiro para float"""
+        return parse_valor_brasileiro(valor_str)
+
+    def _assinatura(self, ate_byte):
+        """
+        Assinatura do trecho [0, ate_byte) do arquivo de entrada: header + último bloco.
+
+        Detecta quando o arquivo foi regravado com outro conteúdo, sem precisar reler
+        todo o histórico a cada execução.
+        """
+        digest = hashlib.sha256()
+        with open(self.input_file, 'rb') as f:
+            digest.update(f.readline())
+            f.seek(max(0, ate_byte - BLOCO_ASSINATURA))
+            digest.update(f.read(min(ate_byte, BLOCO_ASSINATURA)))
+        digest.update(str(ate_byte).encode())
+        return digest.hexdigest()
+
+    def _ler_controle(self, conn):
+        """Retorna (bytes_processados, registros_processados, assinatura) da última carga, ou None"""
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_controle (
+            ARQUIVO TEXT PRIMARY KEY,
+            BYTES_PROCESSADOS INTEGER,
+            REGISTROS_PROCESSADOS INTEGER,
+            ASSINATURA TEXT,
+            DATA_EXECUCAO TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        return conn.execute(
+            "SELECT BYTES_PROCESSADOS, REGISTROS_PROCESSADOS, ASSINATURA FROM etl_controle WHERE ARQUIVO = ?",
+            (Path(self.input_file).name,)
+        ).fetchone()
+
+    def _salvar_controle(self, conn, bytes_processados, registros_processados):
+        """Grava a marca d'água (watermark) da entrada já ingerida"""
+        self._ler_controle(conn)
+        conn.execute("""
+        INSERT OR REPLACE INTO etl_controle
+            (ARQUIVO, BYTES_PROCESSADOS, REGISTROS_PROCESSADOS, ASSINATURA, DATA_EXECUCAO)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (Path(self.input_file).name, bytes_processados, registros_processados,
+              self._assinatura(bytes_processados)))
+
+    def extract_incremental(self, conn):
+        """
+        Extrai apenas os registros acrescentados ao CSV formatado desde a última carga.
+
+        Retorna (df, bytes_processados, incremental). Se não há carga anterior ou o trecho já
+        processado mudou (assinatura diferente), o arquivo inteiro é lido e `incremental` é False.
+        Só linhas completas (terminadas em newline) são consumidas.
+        """
         try:
-            return float(valor_str)
-        except ValueError:
-            return 0.0
+            logger.info("Extraindo novos registros do arquivo CSV...")
+            controle = self._ler_controle(conn)
+
+            with open(self.input_file, 'rb') as f:
+                header = f.readline()
+                inicio_dados = f.tell()
+                tamanho = f.seek(0, io.SEEK_END)
+
+                inicio = inicio_dados
+                incremental = False
+                if controle is not None:
+                    bytes_processados, _, assinatura = controle
+                    if inicio_dados <= bytes_processados <= tamanho \
+                            and self._assinatura(bytes_processados) == assinatura:
+                        inicio = bytes_processados
+                        incremental = True
+                    else:
+                        logger.info("Arquivo de entrada alterado desde a última carga; reprocessando tudo")
+
+                f.seek(inicio)
+                conteudo = f.read(tamanho - inicio)
+
+            # Descartar linha final incompleta; ela será lida na próxima execução
+            fim = conteudo.rfind(b'\n') + 1
+            conteudo = conteudo[:fim]
+
+            with self._etapa('extract') as etapa:
+                df = pd.read_csv(io.BytesIO(header + conteudo), encoding='utf-8')
+                etapa['linhas_saida'] = len(df)
+            with self._etapa('parse_valores', len(df)) as etapa:
+                df['VALOR'] = parse_valores(df['VALOR'])
+                etapa['linhas_saida'] = int(df['VALOR'].notna().sum())
+
+            logger.info(f"Registros novos: {len(df)} (a partir do byte {inicio})")
+            return df, inicio + fim, incremental
+        except FileNotFoundError:
+            logger.error(f"Arquivo {self.input_file} não encontrado")
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao extrair dados: {str(e)}")
+            raise
 
     def extract_data(self):
         """Extrai dados do CSV formatado"""
         try:
             logger.info("Extraindo dados do arquivo CSV...")
-            df = pd.read_csv(self.input_file)
+            with self._etapa('extract') as etapa:
+                df = pd.read_csv(self.input_file)
+                etapa['linhas_saida'] = len(df)
 
             # Converter VALOR de string brasileira para float
-            df['VALOR'] = df['VALOR'].apply(self.parse_valor_brasileiro)
+            with self._etapa('parse_valores', len(df)) as etapa:
+                df['VALOR'] = parse_valores(df['VALOR'])
+                etapa['linhas_saida'] = int(df['VALOR'].notna().sum())
 
             logger.info(f"Dados extraídos com sucesso. Shape: {df.shape}")
             return df
@@ -64,8 +404,11 @@ class ETLProcessor:
             logger.error(f"Erro ao extrair dados: {str(e)}")
             raise
 
-    def transform_data(self, df):
-        """Transforma os dados e cria resumo mensal"""
+    def transform_data(self, df, arredondar=True):
+        """
+        Transforma os dados e cria resumo mensal. Com `arredondar=False`, VALOR_TOTAL e
+        VALOR_MEDIO ficam sem arredondamento (resumos parciais que ainda serão somados).
+        """
         try:
             logger.info("Iniciando transformação dos dados...")
 
@@ -76,32 +419,42 @@ class ETLProcessor:
             if missing_columns:
                 raise ValueError(f"Colunas ausentes no DataFrame: {missing_columns}")
 
-            # Converter coluna de data para agrupamento mensal
-            df['DATA_CADASTRO'] = pd.to_datetime(df['DATA_CADASTRO'], errors='coerce')
+            with self._etapa('coercao_datas', len(df)) as etapa:
+                # Converter coluna de data para agrupamento mensal
+                df['DATA_CADASTRO'] = pd.to_datetime(df['DATA_CADASTRO'], errors='coerce')
 
-            # Remover registros com data inválida
-            df = df.dropna(subset=['DATA_CADASTRO'])
+                # Remover registros com data inválida
+                df = df.dropna(subset=['DATA_CADASTRO'])
 
-            # Criar coluna MES_ANO para agrupamento
-            df['MES_ANO'] = df['DATA_CADASTRO'].dt.to_period('M')
+                # Criar coluna MES_ANO para agrupamento
+                df['MES_ANO'] = df['DATA_CADASTRO'].dt.to_period('M')
+                etapa['linhas_saida'] = len(df)
 
-            # Remover valores NaN nas colunas de agrupamento
-            df_clean = df.dropna(subset=['CREDOR', 'STATUS_TITULO', 'VALOR'])
+            with self._etapa('groupby', len(df)) as etapa:
+                # Remover valores NaN nas colunas de agrupamento
+                df_clean = df.dropna(subset=['CREDOR', 'STATUS_TITULO', 'VALOR'])
 
-            # Criar resumo mensal agrupado por CREDOR e STATUS_TITULO
-            logger.info("Criando resumo mensal agrupado...")
-            resumo = df_clean.groupby(['MES_ANO', 'CREDOR', 'STATUS_TITULO']).agg(
-                QUANTIDADE=('VALOR', 'count'),
-                VALOR_TOTAL=('VALOR', 'sum'),
-                VALOR_MEDIO=('VALOR', 'mean')
-            ).reset_index()
+                # Criar resumo mensal agrupado por CREDOR e STATUS_TITULO
+                logger.info("Criando resumo mensal agrupado...")
+                # observed=True: CREDOR/STATUS_TITULO podem chegar como Categorical do pré-processamento
+                resumo = df_clean.groupby(['MES_ANO', 'CREDOR', 'STATUS_TITULO'], observed=True).agg(
+                    QUANTIDADE=('VALOR', 'count'),
+                    VALOR_TOTAL=('VALOR', 'sum'),
+                    VALOR_MEDIO=('VALOR', 'mean')
+                ).reset_index()
 
-            # Converter MES_ANO para string para melhor armazenamento
-            resumo['MES_ANO'] = resumo['MES_ANO'].astype(str)
+                # Converter MES_ANO para string (e categorias para object) para melhor armazenamento
+                resumo['MES_ANO'] = resumo['MES_ANO'].astype(str)
+                resumo[['CREDOR', 'STATUS_TITULO']] = resumo[['CREDOR', 'STATUS_TITULO']].astype(object)
 
-            # Arredondar valores
-            resumo['VALOR_TOTAL'] = resumo['VALOR_TOTAL'].round(2)
-            resumo['VALOR_MEDIO'] = resumo['VALOR_MEDIO'].round(2)
+                # Categorical agrupa na ordem das categorias; manter a ordem alfabética do resumo
+                resumo = resumo.sort_values(['MES_ANO', 'CREDOR', 'STATUS_TITULO'], ignore_index=True)
+
+                # Arredondar valores
+                if arredondar:
+                    resumo['VALOR_TOTAL'] = resumo['VALOR_TOTAL'].round(2)
+                    resumo['VALOR_MEDIO'] = resumo['VALOR_MEDIO'].round(2)
+                etapa['linhas_saida'] = len(resumo)
 
             logger.info(f"Resumo criado com sucesso. Shape: {resumo.shape}")
             return resumo
@@ -110,6 +463,44 @@ class ETLProcessor:
             logger.error(f"Erro na transformação: {str(e)}")
             raise
 
+    def transform_blocks(self, blocos):
+        """
+        Cria o resumo mensal a partir de blocos de registros já tipados (ex.: vindos direto do
+        pré-processamento), combinando os resumos parciais de cada bloco.
+
+        Com um bloco, o resultado é o de `transform_data`. Com vários, os totais parciais são
+        somados sem arredondamento e VALOR_MEDIO vem do total já arredondado: só médias
+        exatamente na metade de um centavo podem diferir de `transform_data` em R$0,01.
+        """
+        # Somas e contagens sem arredondamento: arredondar só o resultado combinado
+        parciais = [self.transform_data(bloco, arredondar=False) for bloco in blocos]
+        if not parciais:
+            return self.transform_data(pd.DataFrame({
+                'CREDOR': pd.Series(dtype=object),
+                'STATUS_TITULO': pd.Series(dtype=object),
+                'VALOR': pd.Series(dtype=float),
+                'DATA_CADASTRO': pd.Series(dtype=object),
+            }))
+        if len(parciais) == 1:
+            resumo = parciais[0]
+            resumo['VALOR_TOTAL'] = resumo['VALOR_TOTAL'].round(2)
+            resumo['VALOR_MEDIO'] = resumo['VALOR_MEDIO'].round(2)
+            return resumo
+
+        logger.info(f"Combinando {len(parciais)} resumos parciais...")
+        with self._etapa('combinar_blocos', sum(len(p) for p in parciais)) as etapa:
+            resumo = pd.concat(parciais, ignore_index=True).groupby(
+                ['MES_ANO', 'CREDOR', 'STATUS_TITULO'], as_index=False
+            ).agg(
+                QUANTIDADE=('QUANTIDADE', 'sum'),
+                VALOR_TOTAL=('VALOR_TOTAL', 'sum')
+            )
+            # Total arredondado uma vez e média a partir dele: não depende da divisão em blocos
+            resumo['VALOR_TOTAL'] = resumo['VALOR_TOTAL'].round(2)
+            resumo['VALOR_MEDIO'] = (resumo['VALOR_TOTAL'] / resumo['QUANTIDADE']).round(2)
+            etapa['linhas_saida'] = len(resumo)
+        return resumo
+
     def load_to_database(self, df_resumo):
         """Carrega o resumo para SQLite"""
         try:
@@ -118,37 +509,112 @@ class ETLProcessor:
             # Garantir que o diretório existe
             Path('data').mkdir(exist_ok=True)
 
-            conn = sqlite3.connect(self.output_db)
-
-            # Criar tabela se não existir
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS resumo_mensal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                MES_ANO TEXT,
-                CREDOR TEXT,
-                STATUS_TITULO TEXT,
-                QUANTIDADE INTEGER,
-                VALOR_TOTAL REAL,
-                VALOR_MEDIO REAL,
-                DATA_CRIACAO TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            with self._etapa('load_sqlite', len(df_resumo)) as etapa:
+                conn = self._conectar(isolation_level=None)
+                try:
+                    for pragma in PRAGMAS_CARGA:
+                        conn.execute(pragma)
+
+                    inicio = time.perf_counter()
+
+                    # Recriar a tabela com o schema declarado, numa única transação
+                    conn.execute("BEGIN")
+                    conn.execute("DROP TABLE IF EXISTS resumo_mensal")
+                    conn.execute(CREATE_RESUMO_MENSAL)
+
+                    # Inserir dados
+                    logger.info("Inserindo dados no banco...")
+                    conn.executemany(INSERT_RESUMO_MENSAL, _linhas_resumo(df_resumo))
+
+                    # Índices depois da carga: uma ordenação por índice em vez de atualizá-los a cada INSERT
+                    for indice in INDICES_RESUMO_MENSAL:
+                        conn.execute(indice)
+
+                    self.build_rollups(conn)
+                    self.build_search_index(conn)
+
+                    conn.execute("COMMIT")
+                except Exception:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.close()
+                etapa['linhas_saida'] = len(df_resumo)
+
+            duracao = time.perf_counter() - inicio
+            self.ultima_carga = {
+                'linhas': len(df_resumo),
+                'segundos': round(duracao, 4),
+                'linhas_por_segundo': round(len(df_resumo) / duracao, 1) if duracao > 0 else None,
+            }
+            logger.info(
+                f"Dados carregados no banco SQLite com sucesso: {len(df_resumo)} linhas em "
+                f"{duracao:.3f}s ({self.ultima_carga['linhas_por_segundo']} linhas/s)"
             )
-            """
-
-            conn.execute(create_table_query)
-            conn.commit()
-
-            # Inserir dados
-            logger.info("Inserindo dados no banco...")
-            df_resumo.to_sql('resumo_mensal', conn, if_exists='replace', index=False)
-
-            conn.commit()
-            conn.close()
-            logger.info("Dados carregados no banco SQLite com sucesso")
 
         except Exception as e:
             logger.error(f"Erro ao carregar no banco: {str(e)}")
             raise
 
+    def merge_into_database(self, conn, df_resumo):
+        """Soma o resumo dos registros novos aos grupos (MES_ANO, CREDOR, STATUS_TITULO) existentes"""
+        logger.info("Mesclando resumo incremental no banco...")
+
+        # Bancos gerados por versões anteriores não têm os índices (nem a chave única do upsert)
+        for indice in INDICES_RESUMO_MENSAL:
+            conn.execute(indice)
+
+        # Os valores à direita do SET referem-se à linha antes da atualização
+        with self._etapa('merge_sqlite', len(df_resumo)) as etapa:
+            conn.executemany("""
+            INSERT INTO resumo_mensal (MES_ANO, CREDOR, STATUS_TITULO, QUANTIDADE, VALOR_TOTAL, VALOR_MEDIO)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (MES_ANO, CREDOR, STATUS_TITULO) DO UPDATE SET
+                QUANTIDADE = QUANTIDADE + excluded.QUANTIDADE,
+                VALOR_TOTAL = ROUND(VALOR_TOTAL + excluded.VALOR_TOTAL, 2),
+                VALOR_MEDIO = ROUND((VALOR_TOTAL + excluded.VALOR_TOTAL)
+                                    / (QUANTIDADE + excluded.QUANTIDADE), 2)
+            """, _linhas_resumo(df_resumo))
+            etapa['linhas_saida'] = len(df_resumo)
+
+        logger.info(f"Grupos mesclados: {len(df_resumo)}")
+
+    def build_rollups(self, conn):
+        """Recria as tabelas de agregação (por status, por credor e totais) a partir de resumo_mensal"""
+        for sql in ROLLUPS_RESUMO:
+            conn.execute(sql)
+
+    def build_search_index(self, conn):
+        """
+        Recria o índice de busca dos filtros de credor e status. As formas minúsculas são geradas
+        em Python (str.lower cobre acentos, ao contrário do lower() do SQLite); sem FTS5 no SQLite,
+        fica só a tabela termos_busca e as consultas varrem os valores distintos.
+        """
+        for sql in CREATE_TERMOS_BUSCA:
+            conn.execute(sql)
+
+        for campo, coluna in CAMPOS_BUSCA.items():
+            valores = [row[0] for row in conn.execute(f"SELECT DISTINCT {coluna} FROM resumo_mensal")]
+            conn.executemany(
+                "INSERT INTO termos_busca (CAMPO, VALOR, VALOR_NORMALIZADO) VALUES (?, ?, ?)",
+                ((campo, valor, valor.lower()) for valor in valores)
+            )
+
+        try:
+            conn.execute(CREATE_TERMOS_BUSCA_FTS)
+            conn.execute("INSERT INTO termos_busca_fts (termos_busca_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Índice FTS5 indisponível, busca sem trigramas: {e}")
+
+    def read_resumo(self, conn):
+        """Lê o resumo mensal completo do banco"""
+        return pd.read_sql_query("""
+        SELECT MES_ANO, CREDOR, STATUS_TITULO, QUANTIDADE, VALOR_TOTAL, VALOR_MEDIO
+        FROM resumo_mensal
+        ORDER BY MES_ANO, CREDOR, STATUS_TITULO
+        """, conn)
+
     def load_to_csv(self, df_resumo):
         """Salva o resumo em CSV (formato brasileiro)"""
         try:
@@ -157,42 +623,283 @@ class ETLProcessor:
             # Garantir que o diretório existe
             Path('data').mkdir(exist_ok=True)
 
-            # Converter valores para formato brasileiro
-            df_export = df_resumo.copy()
-            df_export['VALOR_TOTAL'] = df_export['VALOR_TOTAL'].apply(
-                lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            )
-            df_export['VALOR_MEDIO'] = df_export['VALOR_MEDIO'].apply(
-                lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            )
+            with self._etapa('load_csv', len(df_resumo)) as etapa:
+                # Converter valores para formato brasileiro
+                df_export = df_resumo.copy()
+                df_export['VALOR_TOTAL'] = formatar_valores(df_export['VALOR_TOTAL'])
+                df_export['VALOR_MEDIO'] = formatar_valores(df_export['VALOR_MEDIO'])
 
-            df_export.to_csv(self.output_csv, index=False, encoding='utf-8')
+                df_export.to_csv(self.output_csv, index=False, encoding='utf-8')
+                etapa['linhas_saida'] = len(df_export)
             logger.info(f"Resumo salvo em: {self.output_csv}")
         except Exception as e:
             logger.error(f"Erro ao salvar CSV: {str(e)}")
             raise
 
-    def run_etl(self):
-        """Executa todo o processo ETL"""
+    def _preparar_detalhes(self, df):
+        """Converte os registros detalhados para o schema do dataset Parquet"""
+        detalhe = pd.DataFrame(index=df.index)
+        for col in ['CREDOR', 'CAMPANHA', 'CLIENTE', 'STATUS_TITULO']:
+            # Categorias viram texto simples: o Parquet já aplica dictionary encoding
+            detalhe[col] = df[col].astype(object).where(df[col].notna(), None) if col in df else None
+        for col in ['DATA_CADASTRO', 'DATA_PAGAMENTO']:
+            detalhe[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce') if col in df else pd.NaT
+        detalhe['VALOR'] = df['VALOR'].astype(float)
+        detalhe['MES_ANO'] = detalhe['DATA_CADASTRO'].dt.strftime('%Y-%m')
+        return pa.Table.from_pandas(detalhe[SCHEMA_DETALHE.names], schema=SCHEMA_DETALHE, preserve_index=False)
+
+    def _escrever_parquet(self, tabela, nome, substituir):
+        """Grava no staging durante run_etl (publicado com o banco) ou direto em output_parquet"""
+        publicado = Path(self.output_parquet) / nome
+        if self._parquet_staging is None:
+            destino = publicado
+        else:
+            destino = Path(self._parquet_staging) / nome
+            if not substituir and not destino.exists() and publicado.exists():
+                # Acréscimo: o staging parte dos arquivos já publicados, sem copiar os dados
+                shutil.copytree(publicado, destino, copy_function=_vincular_arquivo)
+        if substituir and destino.exists():
+            shutil.rmtree(destino)
+        ds.write_dataset(
+            tabela, destino, format='parquet', partitioning=PARTICIONAMENTO,
+            # Nome único por gravação: cargas incrementais só acrescentam arquivos
+            basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        # Uma tabela vazia não gera arquivos: o diretório vazio publica o dataset vazio
+        destino.mkdir(parents=True, exist_ok=True)
+
+    def load_details_to_parquet(self, df, substituir=True):
+        """
+        Grava os registros detalhados (já tipados) no dataset Parquet `cobrancas`, particionado
+        por MES_ANO. Com `substituir=False`, os arquivos são acrescentados aos existentes.
+        """
+        if self.output_parquet is None:
+            return
+        try:
+            with self._etapa('load_parquet_detalhes', len(df)) as etapa:
+                tabela = self._preparar_detalhes(df)
+                self._escrever_parquet(tabela, 'cobrancas', substituir)
+                etapa['linhas_saida'] = tabela.num_rows
+        except Exception as e:
+            logger.error(f"Erro ao salvar detalhes em Parquet: {str(e)}")
+            raise
+
+    def load_to_parquet(self, df_resumo):
+        """Grava o resumo mensal no dataset Parquet `resumo_mensal`, particionado por MES_ANO"""
+        if self.output_parquet is None:
+            return
+        try:
+            logger.info("Salvando resumo em Parquet...")
+            with self._etapa('load_parquet_resumo', len(df_resumo)) as etapa:
+                tabela = pa.Table.from_pandas(df_resumo, preserve_index=False)
+                self._escrever_parquet(tabela, 'resumo_mensal', substituir=True)
+                etapa['linhas_saida'] = tabela.num_rows
+            logger.info(f"Datasets Parquet salvos em: {self.output_parquet}")
+        except Exception as e:
+            logger.error(f"Erro ao salvar Parquet: {str(e)}")
+            raise
+
+    def _gravando_detalhes(self, blocos):
+        """Repassa os blocos adiante, gravando cada um no dataset Parquet de detalhes"""
+        blocos = iter(blocos)
+        n = 0
+        while True:
+            # Tempo gasto produzindo o bloco (ex.: pré-processamento do CSV bruto)
+            with self._etapa('preprocessamento') as etapa:
+                bloco = next(blocos, None)
+                etapa['linhas_saida'] = None if bloco is None else len(bloco)
+            if bloco is None:
+                if n == 0:
+                    # Nenhum bloco: o dataset de detalhes também fica vazio, como o resumo
+                    self.load_details_to_parquet(pd.DataFrame({'VALOR': pd.Series(dtype=float)}))
+                return
+
+            self.load_details_to_parquet(bloco, substituir=(n == 0))
+            n += 1
+            yield bloco
+
+    def run_etl(self, incremental=False, blocos=None, perfil=False):
+        """
+        Executa todo o processo ETL.
+
+        Com `incremental=True`, só os registros acrescentados ao CSV formatado desde a última
+        execução são agregados e mesclados em resumo_mensal; se não houver carga anterior
+        compatível, o resumo é recriado por completo.
+
+        Com `blocos` (iterável de DataFrames tipados, ex.: `iterar_blocos_limpos`), a extração
+        do CSV formatado é dispensada e o resumo é recriado a partir desses registros.
+
+        Cada etapa é medida (tempo, CPU, pico de memória e linhas); o relatório da execução vai
+        para `output_relatorio` e, se a carga for publicada, para a tabela etl_execucoes. Com
+        `perfil=True`, a execução também roda sob cProfile e tracemalloc (estatísticas em
+        `output_relatorio` e num .prof).
+        """
+        modo = 'incremental' if incremental else 'blocos' if blocos is not None else 'completa'
+        self.perfil_execucao = PerfilExecucao(modo, perfil=perfil)
         try:
             logger.info("Iniciando processo ETL...")
 
-            # Extract
-            df = self.extract_data()
+            # O banco publicado só é trocado (atomicamente) se a carga inteira der certo
+            with self._publicacao():
+                resultado = self._executar_carga(incremental, blocos)
+                # Registrado no staging: o histórico é publicado junto com a carga
+                self._registrar_execucao(resultado)
+            return resultado
 
-            # Transform
-            df_resumo = self.transform_data(df)
+        except Exception as e:
+            logger.error(f"Erro no processo ETL: {str(e)}")
+            # O staging foi descartado: a falha fica só no relatório JSON (o banco publicado não muda)
+            self._registrar_execucao(None, erro=e)
+            return None
+        finally:
+            self.perfil_execucao = None
+
+    def _registrar_execucao(self, resultado, erro=None):
+        """
+        Grava o relatório da execução em andamento (JSON em `output_relatorio`, uma linha em
+        etl_execucoes do banco em staging e, com perfil, o .prof do cProfile). Fora do staging
+        (execução que falhou), o banco não é alterado. Falhas aqui não interrompem o ETL.
+        """
+        etapas = self.perfil_execucao.etapas
+        entrada = etapas.get('extract') or etapas.get('preprocessamento') or {}
+        relatorio = self.perfil_execucao.relatorio(
+            sucesso=erro is None, erro=erro,
+            registros_entrada=entrada.get('linhas_saida'),
+            linhas_resumo=None if resultado is None else len(resultado),
+        )
+        self.ultimo_relatorio = relatorio
+
+        for nome, medida in relatorio['etapas'].items():
+            logger.info(
+                f"Etapa {nome}: {medida['segundos']:.3f}s (CPU {medida['cpu_segundos']:.3f}s, "
+                f"pico {medida['pico_rss_mb']} MiB), linhas {medida['linhas_entrada']} -> {medida['linhas_saida']}"
+            )
+
+        try:
+            if self.output_relatorio is not None:
+                destino = Path(self.output_relatorio)
+                destino.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding='utf-8')
+                if 'perfil_cprofile' in relatorio:
+                    self.perfil_execucao.estatisticas.dump_stats(destino.with_suffix('.prof'))
+                logger.info(f"Relatório da execução salvo em: {destino}")
+
+            # O banco servido só é escrito na publicação: o histórico vai junto com a carga
+            if self._banco_staging is None:
+                return
+
+            conn = self._conectar()
+            try:
+                with conn:
+                    conn.execute(CREATE_ETL_EXECUCOES)
+                    conn.execute("""
+                    INSERT INTO etl_execucoes (INICIO, FIM, MODO, SUCESSO, ERRO, SEGUNDOS, CPU_SEGUNDOS,
+                                               PICO_RSS_MB, REGISTROS_ENTRADA, LINHAS_RESUMO, ETAPAS)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        relatorio['inicio'], relatorio['fim'], relatorio['modo'], int(relatorio['sucesso']),
+                        relatorio['erro'], relatorio['segundos'], relatorio['cpu_segundos'],
+                        relatorio['pico_rss_mb'], relatorio['registros_entrada'], relatorio['linhas_resumo'],
+                        json.dumps(relatorio['etapas'], ensure_ascii=False),
+                    ))
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Não foi possível registrar a execução do ETL: {e}")
+
+    def _executar_carga(self, incremental, blocos):
+        """Etapas de run_etl, escrevendo no banco retornado por `_conectar`"""
+        if incremental:
+            return self._run_incremental()
 
-            # Load
+        if blocos is not None:
+            df_resumo = self.transform_blocks(self._gravando_detalhes(blocos))
             self.load_to_database(df_resumo)
             self.load_to_csv(df_resumo)
+            self.load_to_parquet(df_resumo)
+
+            # O CSV formatado pode não ter sido gerado: a próxima carga incremental será completa
+            self._limpar_controle()
 
             logger.info("Processo ETL concluído com sucesso!")
             return df_resumo
 
-        except Exception as e:
-            logger.error(f"Erro no processo ETL: {str(e)}")
-            return None
+        # Extract
+        df = self.extract_data()
+        self.load_details_to_parquet(df)
+
+        # Transform
+        df_resumo = self.transform_data(df)
+
+        # Load
+        self.load_to_database(df_resumo)
+        self.load_to_csv(df_resumo)
+        self.load_to_parquet(df_resumo)
+
+        # Marca d'água: permite que a próxima execução incremental continue deste ponto
+        self._registrar_carga_completa(Path(self.input_file).stat().st_size, len(df))
+
+        logger.info("Processo ETL concluído com sucesso!")
+        return df_resumo
+
+    def _registrar_carga_completa(self, bytes_processados, registros_processados):
+        """Reinicia a marca d'água após uma recriação completa do resumo"""
+        conn = self._conectar()
+        try:
+            with conn:
+                self._salvar_controle(conn, bytes_processados, registros_processados)
+        finally:
+            conn.close()
+
+    def _limpar_controle(self):
+        """Descarta a marca d'água da entrada"""
+        conn = self._conectar()
+        try:
+            with conn:
+                self._ler_controle(conn)
+                conn.execute("DELETE FROM etl_controle WHERE ARQUIVO = ?", (Path(self.input_file).name,))
+        finally:
+            conn.close()
+
+    def _run_incremental(self):
+        """Extrai os registros novos, mescla o resumo e avança a marca d'água numa única transação"""
+        conn = self._conectar()
+        try:
+            df, bytes_processados, incremental = self.extract_incremental(conn)
+            possui_tabela = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='resumo_mensal'"
+            ).fetchone() is not None
+
+            if not incremental or not possui_tabela:
+                conn.close()
+                self.load_details_to_parquet(df)
+                df_resumo = self.transform_data(df)
+                self.load_to_database(df_resumo)
+                self.load_to_csv(df_resumo)
+                self.load_to_parquet(df_resumo)
+                self._registrar_carga_completa(bytes_processados, len(df))
+                logger.info("Processo ETL concluído com sucesso (carga completa)!")
+                return df_resumo
+
+            _, registros_anteriores, _ = self._ler_controle(conn)
+            with conn:
+                if not df.empty:
+                    self.merge_into_database(conn, self.transform_data(df))
+                self.build_rollups(conn)
+                self.build_search_index(conn)
+                self._salvar_controle(conn, bytes_processados, registros_anteriores + len(df))
+
+            if not df.empty:
+                self.load_details_to_parquet(df, substituir=False)
+
+            df_resumo = self.read_resumo(conn)
+            self.load_to_csv(df_resumo)
+            self.load_to_parquet(df_resumo)
+
+            logger.info("Processo ETL concluído com sucesso (carga incremental)!")
+            return df_resumo
+        finally:
+            conn.close()
 
 
 def query_resumo(mes_ano=None, credor=None, status=None):
@@ -235,10 +942,34 @@ def query_resumo(mes_ano=None, credor=None, status=None):
         return pd.DataFrame()
 
 
+def ler_parquet(dataset, colunas=None, meses=None, filtro=None, base='parquet'):
+    """
+    Lê um dataset Parquet do ETL ('cobrancas' ou 'resumo_mensal') carregando só o necessário.
+
+    - colunas: lista de colunas a ler (None = todas)
+    - meses: lista de MES_ANO ("YYYY-MM"); só as partições desses meses são abertas
+    - filtro: expressão `pyarrow.dataset` adicional, ex.: ds.field('CREDOR') == 'Credor A'
+    """
+    dados = ds.dataset(Path(base) / dataset, format='parquet', partitioning=PARTICIONAMENTO)
+
+    if meses:
+        filtro_meses = ds.field('MES_ANO').isin([str(m) for m in meses])
+        filtro = filtro_meses if filtro is None else filtro & filtro_meses
+
+    return dados.to_table(columns=colunas, filter=filtro).to_pandas()
+
+
 # Executar ETL se o script for rodado diretamente
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o resumo mensal de cobranças")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Agrega apenas os registros novos desde a última execução")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Executa sob cProfile e tracemalloc (estatísticas no relatório e em etl_execucao.prof)")
+    args = parser.parse_args()
+
     etl = ETLProcessor()
-    resultado = etl.run_etl()
+    resultado = etl.run_etl(incremental=args.incremental, perfil=args.perfil)
 
     if resultado is not None:
         print("\nResumo criado com sucesso!")
@@ -0,0 +1,195 @@
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1024 * 1024
+
+# Funções listadas no relatório quando o cProfile está ativo
+FUNCOES_PERFIL = 25
+
+
+def pico_rss_mb():
+    """Pico de memória residente do processo (VmHWM no Linux, ru_maxrss nos demais), em MiB"""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return pico / MIB if sys.platform == "darwin" else pico / 1024
+
+
+def reiniciar_pico_rss():
+    """Zera o pico de memória residente (só no Linux); retorna False se não for possível"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class PerfilExecucao:
+    """
+    Mede as etapas de uma execução do ETL: tempo de relógio, tempo de CPU (do processo), pico
+    de memória residente e linhas de entrada/saída. Etapas repetidas (ex.: uma por bloco) são
+    acumuladas sob o mesmo nome. O pico de memória residente é zerado no início de cada etapa,
+    então é o pico da própria etapa (etapas que contêm outras ficam com o maior dos picos);
+    onde não pode ser zerado (fora do Linux), é o pico do processo até o fim da etapa.
+
+    Com `perfil=True`, a execução inteira também roda sob cProfile e tracemalloc (até
+    `relatorio`): o relatório ganha as funções mais custosas e o pico de memória alocada pelo
+    Python em cada etapa.
+    """
+
+    def __init__(self, modo, perfil=False):
+        self.modo = modo
+        self.perfil = perfil
+        self.etapas = {}
+        self.inicio = datetime.now()
+        self._relogio = time.perf_counter()
+        self._cpu = time.process_time()
+        self._profiler = None
+        # Picos de memória residente das etapas em andamento, preservados quando uma etapa interna
+        # zera o pico do processo
+        self._picos_abertos = []
+        # Só para o tracemalloc ao final quem o iniciou (o chamador pode já estar rastreando)
+        self._iniciou_tracemalloc = False
+
+        if perfil:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._iniciou_tracemalloc = True
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        """
+        Mede o bloco `with` como a etapa `nome`. O dict produzido recebe as contagens conhecidas
+        só ao final (ex.: registro['linhas_saida'] = len(df)).
+        """
+        registro = {'linhas_entrada': linhas_entrada, 'linhas_saida': None}
+        self._fechar_picos_abertos()
+        reiniciar_pico_rss()
+        self._picos_abertos.append(None)
+        if self.perfil:
+            tracemalloc.reset_peak()
+            alocado = tracemalloc.get_traced_memory()[0]
+        relogio, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            segundos, cpu_segundos = time.perf_counter() - relogio, time.process_time() - cpu
+            self._fechar_picos_abertos()
+            pico = self._picos_abertos.pop()
+            medida = {
+                'chamadas': 1,
+                'segundos': segundos,
+                'cpu_segundos': cpu_segundos,
+                'pico_rss_mb': pico,
+                'linhas_entrada': registro['linhas_entrada'],
+                'linhas_saida': registro['linhas_saida'],
+            }
+            if self.perfil:
+                medida['pico_tracemalloc_mb'] = (tracemalloc.get_traced_memory()[1] - alocado) / MIB
+            self._acumular(nome, medida)
+
+    def _fechar_picos_abertos(self):
+        """Leva o pico de memória residente atual para as etapas em andamento"""
+        pico = pico_rss_mb()
+        if pico is None:
+            return
+        self._picos_abertos = [
+            pico if anterior is None else max(anterior, pico) for anterior in self._picos_abertos
+        ]
+
+    def incorporar(self, etapas):
+        """Acumula as etapas medidas por outra execução (ex.: `etapas` de um worker)"""
+        for nome, medida in etapas.items():
+            self._acumular(nome, dict(medida))
+
+    def _acumular(self, nome, medida):
+        atual = self.etapas.get(nome)
+        if atual is None:
+            self.etapas[nome] = medida
+            return
+        for chave, valor in medida.items():
+            if valor is None:
+                continue
+            if atual.get(chave) is None:
+                atual[chave] = valor
+            elif chave.startswith('pico_'):
+                atual[chave] = max(atual[chave], valor)
+            else:
+                atual[chave] += valor
+
+    def _funcoes_custosas(self):
+        """Funções com maior tempo acumulado segundo o cProfile"""
+        self._profiler.disable()
+        saida = io.StringIO()
+        estatisticas = pstats.Stats(self._profiler, stream=saida)
+        estatisticas.sort_stats('cumulative').print_stats(FUNCOES_PERFIL)
+        return estatisticas, saida.getvalue()
+
+    def relatorio(self, sucesso, erro=None, **extras):
+        """
+        Encerra a medição e monta o relatório da execução. Com perfil ativo, as estatísticas do
+        cProfile ficam em `self.estatisticas` (pstats.Stats) para gravação em arquivo .prof.
+        """
+        etapas = {
+            nome: {
+                chave: round(valor, 1 if chave.startswith('pico_') else 4) if isinstance(valor, float) else valor
+                for chave, valor in medida.items()
+            }
+            for nome, medida in self.etapas.items()
+        }
+        picos = [m['pico_rss_mb'] for m in self.etapas.values() if m.get('pico_rss_mb') is not None]
+
+        relatorio = {
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'fim': datetime.now().isoformat(timespec='seconds'),
+            'modo': self.modo,
+            'sucesso': sucesso,
+            'erro': None if erro is None else str(erro),
+            'segundos': round(time.perf_counter() - self._relogio, 4),
+            'cpu_segundos': round(time.process_time() - self._cpu, 4),
+            'pico_rss_mb': round(max(picos), 1) if picos else None,
+            **extras,
+            'etapas': etapas,
+        }
+
+        if self._profiler is not None:
+            self.estatisticas, texto = self._funcoes_custosas()
+            relatorio['perfil_cprofile'] = texto.strip().splitlines()
+            relatorio['alocacoes_tracemalloc'] = [
+                str(estatistica)
+                for estatistica in tracemalloc.take_snapshot().statistics('lineno')[:FUNCOES_PERFIL]
+            ]
+            self._profiler = None
+            if self._iniciou_tracemalloc:
+                tracemalloc.stop()
+                self._iniciou_tracemalloc = False
+        return relatorio
+
+
+def etapa_opcional(perfil_execucao, nome, linhas_entrada=None):
+    """`perfil_execucao.etapa(...)`, ou um bloco sem medição quando não há execução instrumentada"""
+    if perfil_execucao is None:
+        return nullcontext({'linhas_entrada': linhas_entrada, 'linhas_saida': None})
+    return perfil_execucao.etapa(nome, linhas_entrada)
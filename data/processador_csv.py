@@ -1,164 +1,500 @@
 import pandas as pd
+import numpy as np
 from pathlib import Path
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import shutil
+import tempfile
 import re
 
-def processar_csv():
-    # ------------------------
-    # 1. LER E RECONSTRUIR O CSV
-    # ------------------------
-    # ✅ CORRIGIDO: Adicionar "data/" no caminho
-    csv_path = Path("dados_cobranca.csv")
+from valores import parse_valores, formatar_valores
+from instrumentacao import PerfilExecucao, etapa_opcional
 
-    # Verificar se o arquivo existe
-    if not csv_path.exists():
-        raise FileNotFoundError(f"Arquivo não encontrado: {csv_path.absolute()}")
+COLUNAS = ['CREDOR', 'CAMPANHA', 'CLIENTE', 'DATA_CADASTRO', 'DATA_PAGAMENTO', 'STATUS_TITULO', 'VALOR']
 
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+# Linhas por bloco em cada worker do modo paralelo, quando chunksize não é informado
+CHUNKSIZE_PARALELO = 100_000
 
-    reconstructed_data = []
+# Layouts de data encontrados na origem: (regex de detecção, formato explícito)
+LAYOUTS_DATA = [
+    (r'\d{4}-\d{1,2}-\d{1,2}', '%Y-%m-%d'),       # 2023-01-15
+    (r'\d{1,2}/\d{1,2}/\d{4}', '%d/%m/%Y'),       # 15/01/2023
+    (r'[A-Za-z]{3} \d{1,2} \d{4}', '%b %d %Y'),    # Jan 15 2023
+]
 
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if not line:
-            continue
 
+# ------------------------
+# 1. RECONSTRUÇÃO DAS LINHAS
+# ------------------------
+def reconstruir_linha(line):
+    """Repara uma linha de dados do CSV bruto; retorna None se a linha for descartada"""
+    line = line.strip()
+    if not line:
+        return None
+
+    # Corrigir casos tipo "2,500.50" → "2500.50"
+    line = re.sub(r'(\d),(\d{3}\.\d+)', r'\1\2', line)
+
+    # Substituir delimitadores inconsistentes
+    line = line.replace(',', ';')
+    parts = line.split(';')
+
+    if len(parts) < 6:
+        return None
+
+    credor = parts[0].strip().lower()
+    campanha = parts[1].strip().lower()
+    cliente = parts[2].strip()
+    data_cadastro = parts[3].strip()
+    data_pagamento = parts[4].strip() if len(parts) > 4 else ''
+    status_titulo = parts[5].strip().lower() if len(parts) > 5 else ''
+    valor = parts[6].strip() if len(parts) > 6 else ''
+
+    return [credor, campanha, cliente, data_cadastro, data_pagamento, status_titulo, valor]
+
+
+def reconstruir_linhas(lines, primeira_linha=0):
+    """
+    Repara um bloco de linhas do CSV bruto.
+
+    `primeira_linha` é o índice da primeira linha do bloco no arquivo; a linha 0 é o header
+    (C#EDOR etc.) e é sempre descartada, pois as colunas são fixas.
+    """
+    reconstructed_data = []
+
+    for i, line in enumerate(lines, start=primeira_linha):
         # Corrigir header
         if i == 0:
-            if 'C#EDOR' in line:
-                line = line.replace('C#EDOR', 'CREDOR')
-            reconstructed_data.append(
-                ['CREDOR', 'CAMPANHA', 'CLIENTE', 'DATA_CADASTRO', 'DATA_PAGAMENTO', 'STATUS_TITULO', 'VALOR']
-            )
             continue
 
-        # Corrigir casos tipo "2,500.50" → "2500.50"
-        line = re.sub(r'(\d),(\d{3}\.\d+)', r'\1\2', line)
+        registro = reconstruir_linha(line)
+        if registro is not None:
+            reconstructed_data.append(registro)
 
-        # Substituir delimitadores inconsistentes
-        line = line.replace(',', ';')
-        parts = line.split(';')
+    return reconstructed_data
 
-        if len(parts) >= 6:
-            credor = parts[0].strip().lower()
-            campanha = parts[1].strip().lower()
-            cliente = parts[2].strip()
-            data_cadastro = parts[3].strip()
-            data_pagamento = parts[4].strip() if len(parts) > 4 else ''
-            status_titulo = parts[5].strip().lower() if len(parts) > 5 else ''
-            valor = parts[6].strip() if len(parts) > 6 else ''
 
-            reconstructed_data.append(
-                [credor, campanha, cliente, data_cadastro, data_pagamento, status_titulo, valor]
-            )
+# ------------------------
+# 2. FUNÇÕES DE FORMATAÇÃO
+# ------------------------
+def formatar_credor(credor):
+    if pd.isna(credor) or str(credor).strip() == '':
+        return 'Credor Desconhecido'
+    return str(credor).strip().title()
 
-    # Criar DataFrame
-    df = pd.DataFrame(reconstructed_data[1:], columns=reconstructed_data[0])
 
-    # ------------------------
-    # 2. FUNÇÕES DE FORMATAÇÃO
-    # ------------------------
-    def formatar_credor(credor):
-        if pd.isna(credor) or str(credor).strip() == '':
-            return 'Credor Desconhecido'
-        return str(credor).strip().title()
-
-    def formatar_campanha(campanha):
-        if pd.isna(campanha) or str(campanha).strip() == '':
-            return 'Campanha 1'
-        campanha = str(campanha).strip().lower()
-        numeros = re.findall(r'\d+', campanha)
-        if numeros:
-            return f'Campanha {numeros[0]}'
-        return campanha.title()
-
-    def formatar_cliente(cliente):
-        if pd.isna(cliente) or str(cliente).strip() == '':
-            return 'Cliente X'
-        original = str(cliente).strip()
-        sem_prefixo = re.sub(r'(?i)^cliente\s*', '', original).strip()
-        if sem_prefixo == '':
-            return 'Cliente X'
-        m = re.search(r'([A-Za-z0-9]+)$', sem_prefixo)
-        if not m:
-            return 'Cliente X'
-        sufixo = m.group(1)
-        if sufixo.isdigit():
-            sufixo_formatado = sufixo
-        else:
-            sufixo_formatado = sufixo[-1].upper()
-        return f"Cliente {sufixo_formatado}"
-
-    def formatar_data(data_str):
-        if pd.isna(data_str) or str(data_str).strip() == '':
-            return ''
-        data_str = str(data_str).strip()
-        try:
-            dt = pd.to_datetime(data_str, errors='coerce', dayfirst=True)
-            return dt.strftime('%Y-%m-%d') if not pd.isna(dt) else ''
-        except:
-            return ''
-
-    def formatar_status(status):
-        if pd.isna(status) or str(status).strip() == '':
-            return 'Pendente'
-        status = str(status).strip().lower()
-        if any(p in status for p in ['pago', 'paid', 'liquidado']):
-            return 'Pago'
-        if any(p in status for p in ['vencido', 'overdue']):
-            return 'Vencido'
-        if any(p in status for p in ['pendente', 'pending']):
-            return 'Pendente'
+def formatar_campanha(campanha):
+    if pd.isna(campanha) or str(campanha).strip() == '':
+        return 'Campanha 1'
+    campanha = str(campanha).strip().lower()
+    numeros = re.findall(r'\d+', campanha)
+    if numeros:
+        return f'Campanha {numeros[0]}'
+    return campanha.title()
+
+
+def formatar_cliente(cliente):
+    if pd.isna(cliente) or str(cliente).strip() == '':
+        return 'Cliente X'
+    original = str(cliente).strip()
+    sem_prefixo = re.sub(r'(?i)^cliente\s*', '', original).strip()
+    if sem_prefixo == '':
+        return 'Cliente X'
+    m = re.search(r'([A-Za-z0-9]+)$', sem_prefixo)
+    if not m:
+        return 'Cliente X'
+    sufixo = m.group(1)
+    if sufixo.isdigit():
+        sufixo_formatado = sufixo
+    else:
+        sufixo_formatado = sufixo[-1].upper()
+    return f"Cliente {sufixo_formatado}"
+
+
+def formatar_data(data_str):
+    if pd.isna(data_str) or str(data_str).strip() == '':
+        return ''
+    data_str = str(data_str).strip()
+    try:
+        dt = pd.to_datetime(data_str, errors='coerce', dayfirst=True)
+        return dt.strftime('%Y-%m-%d') if not pd.isna(dt) else ''
+    except:
+        return ''
+
+
+def formatar_status(status):
+    if pd.isna(status) or str(status).strip() == '':
+        return 'Pendente'
+    status = str(status).strip().lower()
+    if any(p in status for p in ['pago', 'paid', 'liquidado']):
+        return 'Pago'
+    if any(p in status for p in ['vencido', 'overdue']):
+        return 'Vencido'
+    if any(p in status for p in ['pendente', 'pending']):
         return 'Pendente'
+    return 'Pendente'
+
+
+def _aplicar_unicos(serie, formatar_unicos, cache=None):
+    """
+    Aplica `formatar_unicos` apenas aos valores distintos de `serie`.
+
+    `formatar_unicos` recebe uma Series de valores sem repetição e devolve os valores formatados
+    na mesma ordem. Com `cache`, valores já formatados em chamadas anteriores (outros blocos ou
+    colunas) não são processados de novo. Retorna (valores formatados dos únicos, códigos).
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    if cache is None:
+        cache = {}
+
+    faltantes = [v for v in unicos if v not in cache]
+    if faltantes:
+        cache.update(zip(faltantes, formatar_unicos(pd.Series(faltantes, dtype=object))))
+
+    return np.array([cache[v] for v in unicos], dtype=object), codigos
+
+
+def _formatar_unicos(serie, formatar, cache=None):
+    """Aplica o formatador escalar `formatar` uma vez por valor distinto; retorna array object"""
+    formatados, codigos = _aplicar_unicos(serie, lambda unicos: unicos.map(formatar), cache)
+    return formatados[codigos]
+
+
+def _formatar_categoria(serie, formatar, cache=None):
+    """Como `_formatar_unicos`, mas devolve uma coluna Categorical (colunas de baixa cardinalidade)"""
+    formatados, codigos = _aplicar_unicos(serie, lambda unicos: unicos.map(formatar), cache)
+    # Valores brutos diferentes podem gerar o mesmo valor formatado ("credor a " e "Credor A")
+    codigos_categoria, categorias = pd.factorize(formatados, sort=True)
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_categoria[codigos], categories=categorias),
+        index=serie.index, name=serie.name
+    )
+
+
+def _parse_datas_unicas(datas):
+    """Converte datas distintas para YYYY-MM-DD, agrupando-as pelo layout detectado"""
+    vazias = datas.isna() | (datas.astype(str).str.strip() == '')
+    texto = datas.astype(str).str.strip()
+    resultado = pd.Series('', index=datas.index, dtype=object)
+    pendentes = ~vazias
 
-    def parse_valor(valor):
-        if pd.isna(valor) or str(valor).strip().lower() in ("", "null"):
-            return 0.0
-        valor_str = str(valor).strip()
-        valor_str = re.sub(r'[^\d,.-]', '', valor_str)
-        if '.' in valor_str and ',' in valor_str:
-            valor_str = valor_str.replace('.', '').replace(',', '.')
-        elif re.match(r'^\d+\.\d{3}$', valor_str):
-            valor_str = valor_str.replace('.', '')
-        elif ',' in valor_str:
-            valor_str = valor_str.replace(',', '.')
-        try:
-            return float(valor_str)
-        except:
-            return 0.0
+    for padrao, formato in LAYOUTS_DATA:
+        grupo = pendentes & texto.str.fullmatch(padrao)
+        if grupo.any():
+            dt = pd.to_datetime(texto[grupo], format=formato, errors='coerce')
+            resultado[grupo] = dt.dt.strftime('%Y-%m-%d').fillna('')
+            pendentes &= ~grupo
+
+    # Layouts desconhecidos seguem pela inferência do pandas, valor a valor
+    if pendentes.any():
+        resultado[pendentes] = texto[pendentes].apply(formatar_data)
+
+    return resultado
+
+
+def normalizar_datas(serie, cache=None):
+    """
+    Normaliza uma coluna de datas inteira para YYYY-MM-DD.
+
+    Cada layout conhecido (ISO, dd/mm/yyyy, "Jan 15 2023") é convertido de uma vez com formato
+    explícito, e cada string distinta é convertida uma única vez (memoizada em `cache`).
+    """
+    formatados, codigos = _aplicar_unicos(serie, _parse_datas_unicas, cache)
+    return pd.Series(formatados[codigos], index=serie.index, name=serie.name, dtype=object)
+
+
+def limpar_dataframe(reconstructed_data, caches=None, perfil_execucao=None):
+    """
+    Cria o DataFrame de um bloco de registros reparados e aplica as formatações,
+    mantendo VALOR como float.
+
+    `caches` guarda os valores já formatados entre blocos de um mesmo processamento. Com
+    `perfil_execucao` (instrumentacao.PerfilExecucao), cada formatação é medida como uma etapa.
+    """
+    with etapa_opcional(perfil_execucao, 'dataframe', len(reconstructed_data)):
+        df = pd.DataFrame(reconstructed_data, columns=COLUNAS)
+    if caches is None:
+        caches = {}
+    linhas = len(df)
 
     # ------------------------
     # 3. APLICAR FORMATAÇÕES
     # ------------------------
-    df["CREDOR"] = df["CREDOR"].apply(formatar_credor)
-    df["CAMPANHA"] = df["CAMPANHA"].apply(formatar_campanha)
-    df["CLIENTE"] = df["CLIENTE"].apply(formatar_cliente)
-    df["DATA_CADASTRO"] = df["DATA_CADASTRO"].apply(formatar_data)
-    df["DATA_PAGAMENTO"] = df["DATA_PAGAMENTO"].apply(formatar_data)
-    df["STATUS_TITULO"] = df["STATUS_TITULO"].apply(formatar_status)
-    df["VALOR"] = df["VALOR"].apply(parse_valor)
+    # CREDOR, CAMPANHA e STATUS_TITULO têm poucas dezenas de valores distintos: formatar só os
+    # únicos e manter como Categorical. CLIENTE é memoizado apenas dentro do bloco.
+    with etapa_opcional(perfil_execucao, 'formatar_credor', linhas):
+        df["CREDOR"] = _formatar_categoria(df["CREDOR"], formatar_credor, caches.setdefault('credor', {}))
+    with etapa_opcional(perfil_execucao, 'formatar_campanha', linhas):
+        df["CAMPANHA"] = _formatar_categoria(df["CAMPANHA"], formatar_campanha, caches.setdefault('campanha', {}))
+    with etapa_opcional(perfil_execucao, 'formatar_cliente', linhas):
+        df["CLIENTE"] = _formatar_unicos(df["CLIENTE"], formatar_cliente)
+    with etapa_opcional(perfil_execucao, 'normalizar_datas', linhas):
+        df["DATA_CADASTRO"] = normalizar_datas(df["DATA_CADASTRO"], caches.setdefault('datas', {}))
+        df["DATA_PAGAMENTO"] = normalizar_datas(df["DATA_PAGAMENTO"], caches.setdefault('datas', {}))
+    with etapa_opcional(perfil_execucao, 'formatar_status', linhas):
+        df["STATUS_TITULO"] = _formatar_categoria(
+            df["STATUS_TITULO"], formatar_status, caches.setdefault('status', {})
+        )
+    with etapa_opcional(perfil_execucao, 'parse_valor', linhas):
+        df["VALOR"] = parse_valores(df["VALOR"])
+
+    return df
+
+
+def formatar_dataframe(reconstructed_data, caches=None, perfil_execucao=None):
+    """Como `limpar_dataframe`, com VALOR já no formato do CSV de saída"""
+    df = limpar_dataframe(reconstructed_data, caches, perfil_execucao)
 
     # ------------------------
     # 4. FORMATAR PARA CSV (estilo brasileiro)
     # ------------------------
-    df["VALOR"] = df["VALOR"].apply(
-        lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    )
+    with etapa_opcional(perfil_execucao, 'formatar_valor', len(df)):
+        df["VALOR"] = formatar_valores(df["VALOR"])
+
+    return df
+
+
+# ------------------------
+# 5. GRAVAÇÃO EM BLOCOS / PARTIÇÕES
+# ------------------------
+def _blocos_limpos(linhas, chunksize, primeira_linha=0, perfil_execucao=None):
+    """Gera os DataFrames limpos (VALOR float) das linhas do iterável `linhas`, `chunksize` por vez"""
+    caches = {}
+    while True:
+        with etapa_opcional(perfil_execucao, 'leitura') as etapa:
+            lines = list(islice(linhas, chunksize))
+            etapa['linhas_saida'] = len(lines)
+        if not lines:
+            break
+
+        with etapa_opcional(perfil_execucao, 'reconstrucao', len(lines)) as etapa:
+            reconstructed_data = reconstruir_linhas(lines, primeira_linha)
+            etapa['linhas_saida'] = len(reconstructed_data)
+        primeira_linha += len(lines)
+        if reconstructed_data:
+            yield limpar_dataframe(reconstructed_data, caches, perfil_execucao)
+
+
+def _gravar_em_blocos(linhas, out, chunksize, header=True, primeira_linha=0, perfil_execucao=None):
+    """
+    Repara, formata e grava no arquivo aberto `out` as linhas do iterável `linhas`,
+    `chunksize` linhas por vez. Retorna a quantidade de registros gravados.
+    """
+    total = 0
+    for df in _blocos_limpos(linhas, chunksize, primeira_linha, perfil_execucao):
+        with etapa_opcional(perfil_execucao, 'formatar_valor', len(df)):
+            df["VALOR"] = formatar_valores(df["VALOR"])
+        with etapa_opcional(perfil_execucao, 'gravacao_csv', len(df)):
+            df.to_csv(out, index=False, sep=',', header=header)
+        header = False
+        total += len(df)
+
+    # Arquivo sem registros: gravar só o header
+    if header:
+        formatar_dataframe([]).to_csv(out, index=False, sep=',')
+
+    return total
+
+
+def iterar_blocos_limpos(chunksize=None,
+                         input_path="dados_cobranca.csv",
+                         output_path=None):
+    """
+    Gera o CSV bruto reparado e formatado como DataFrames tipados (VALOR float, arredondado
+    em centavos), prontos para `ETLProcessor.transform_data`, sem passar pelo CSV formatado.
+
+    Sem `chunksize` o arquivo vira um único bloco. Com `output_path`, cada bloco também é
+    gravado no CSV formatado, como em `processar_csv`.
+    """
+    csv_path = Path(input_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {csv_path.absolute()}")
+
+    out = None
+    if output_path is not None:
+        Path(output_path).parent.mkdir(exist_ok=True)
+        out = open(output_path, 'w', encoding='utf-8', newline='')
+
+    try:
+        header = True
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for df in _blocos_limpos(f, chunksize):
+                if out is not None:
+                    df.assign(VALOR=formatar_valores(df["VALOR"])).to_csv(
+                        out, index=False, sep=',', header=header
+                    )
+                    header = False
+
+                # O CSV formatado arredonda VALOR para centavos; manter o mesmo resultado
+                df["VALOR"] = df["VALOR"].round(2)
+                yield df
+
+        if out is not None and header:
+            formatar_dataframe([]).to_csv(out, index=False, sep=',')
+    finally:
+        if out is not None:
+            out.close()
+
+
+def _particionar(csv_path, partes):
+    """Divide o arquivo em até `partes` intervalos de bytes, cada um começando no início de uma linha"""
+    tamanho = csv_path.stat().st_size
+    limites = [0]
+    with open(csv_path, 'rb') as f:
+        for k in range(1, partes):
+            alvo = max(tamanho * k // partes, limites[-1])
+            if alvo == 0:
+                continue
+            # Avançar até o fim da linha que contém o byte anterior ao alvo
+            f.seek(alvo - 1)
+            f.readline()
+            limites.append(f.tell())
+    limites.append(tamanho)
+    return [(inicio, fim) for inicio, fim in zip(limites, limites[1:]) if fim > inicio]
+
+
+def _ler_intervalo(csv_path, inicio, fim):
+    """Lê as linhas de um intervalo de bytes com a mesma quebra de linha do modo texto do Python"""
+    with open(csv_path, 'rb') as f:
+        f.seek(inicio)
+        posicao = inicio
+        for raw in f:
+            if posicao >= fim:
+                break
+            posicao += len(raw)
+            linha = raw.decode('utf-8')
+            if '\r' in linha:
+                # Newlines universais: "\r\n" e "\r" isolado também encerram a linha
+                yield from linha.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+            else:
+                yield linha
+
+
+def _processar_particao(args):
+    """
+    Worker: processa um intervalo de bytes e grava o resultado (sem header) em `parte_path`.
+    Retorna (registros gravados, etapas medidas no worker ou None).
+    """
+    csv_path, inicio, fim, chunksize, parte_path, instrumentar = args
+    perfil_execucao = PerfilExecucao('particao') if instrumentar else None
+    linhas = _ler_intervalo(csv_path, inicio, fim)
+    with open(parte_path, 'w', encoding='utf-8', newline='') as out:
+        # Só o intervalo que começa no byte 0 contém o header do arquivo bruto
+        total = _gravar_em_blocos(linhas, out, chunksize, header=False,
+                                  primeira_linha=0 if inicio == 0 else 1,
+                                  perfil_execucao=perfil_execucao)
+    return total, None if perfil_execucao is None else perfil_execucao.etapas
+
+
+def _processar_paralelo(csv_path, out_path, chunksize, workers, perfil_execucao=None):
+    """Processa partições do arquivo em um pool de processos e concatena as saídas em ordem"""
+    intervalos = _particionar(csv_path, workers * 4)
+
+    with tempfile.TemporaryDirectory(dir=out_path.parent) as tmp_dir:
+        tarefas = [
+            (csv_path, inicio, fim, chunksize, Path(tmp_dir) / f"parte_{n:05d}.csv", perfil_execucao is not None)
+            for n, (inicio, fim) in enumerate(intervalos)
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(_processar_particao, tarefas))
+
+        for _, etapas in resultados:
+            if etapas is not None:
+                perfil_execucao.incorporar(etapas)
+
+        with etapa_opcional(perfil_execucao, 'concatenar_particoes', len(tarefas)):
+            with open(out_path, 'w', encoding='utf-8', newline='') as out:
+                formatar_dataframe([]).to_csv(out, index=False, sep=',')
+                for tarefa in tarefas:
+                    with open(tarefa[4], 'r', encoding='utf-8', newline='') as parte:
+                        shutil.copyfileobj(parte, out)
+
+    return sum(total for total, _ in resultados)
+
+
+def processar_csv(chunksize=None,
+                  input_path="dados_cobranca.csv",
+                  output_path="dados_cobranca_formatado.csv",
+                  workers=None,
+                  perfil_execucao=None):
+    """
+    Lê, repara e formata o CSV bruto de cobranças.
+
+    Sem `chunksize`, o arquivo inteiro é carregado e o DataFrame formatado é retornado.
+    Com `chunksize`, o arquivo é processado em blocos de `chunksize` linhas e cada bloco é
+    anexado ao CSV de saída, mantendo o pico de memória limitado ao tamanho do bloco; nesse
+    modo a função retorna a quantidade de registros gravados. A saída é idêntica nos dois modos.
+
+    Com `workers` > 1, o arquivo é dividido em intervalos de bytes alinhados por linha que são
+    processados em paralelo (em blocos de `chunksize`, padrão CHUNKSIZE_PARALELO) e gravados na
+    ordem original; o resultado é o mesmo arquivo do processamento em um único processo.
+
+    Com `perfil_execucao` (instrumentacao.PerfilExecucao), cada etapa (leitura, reconstrução,
+    formatação de cada coluna, parse e formatação de VALOR, gravação) é medida a cada bloco. No
+    modo paralelo as etapas são medidas nos workers e somadas: os tempos são a soma dos
+    processos e o pico de memória, o maior pico de um worker.
+    """
+    # ------------------------
+    # 1. LER E RECONSTRUIR O CSV
+    # ------------------------
+    # ✅ CORRIGIDO: Adicionar "data/" no caminho
+    csv_path = Path(input_path)
+
+    # Verificar se o arquivo existe
+    if not csv_path.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {csv_path.absolute()}")
 
     # Salvar CSV final - ✅ CORRIGIDO: Salvar na pasta data/
-    out_path = Path("dados_cobranca_formatado.csv")
+    out_path = Path(output_path)
     out_path.parent.mkdir(exist_ok=True)
-    df.to_csv(out_path, index=False, sep=',', encoding='utf-8')
 
-    return df
+    if workers is not None and workers < 1:
+        raise ValueError(f"workers deve ser positivo: {workers}")
+    if chunksize is not None and chunksize < 1:
+        raise ValueError(f"chunksize deve ser positivo: {chunksize}")
+
+    if workers is not None and workers > 1:
+        return _processar_paralelo(csv_path, out_path, chunksize or CHUNKSIZE_PARALELO, workers, perfil_execucao)
+
+    if chunksize is None:
+        with etapa_opcional(perfil_execucao, 'leitura') as etapa:
+            with open(csv_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            etapa['linhas_saida'] = len(lines)
+
+        with etapa_opcional(perfil_execucao, 'reconstrucao', len(lines)) as etapa:
+            reconstructed_data = reconstruir_linhas(lines)
+            etapa['linhas_saida'] = len(reconstructed_data)
+
+        df = formatar_dataframe(reconstructed_data, caches={}, perfil_execucao=perfil_execucao)
+        with etapa_opcional(perfil_execucao, 'gravacao_csv', len(df)):
+            df.to_csv(out_path, index=False, sep=',', encoding='utf-8')
+        return df
+
+    with open(csv_path, 'r', encoding='utf-8') as f, \
+            open(out_path, 'w', encoding='utf-8', newline='') as out:
+        return _gravar_em_blocos(f, out, chunksize, perfil_execucao=perfil_execucao)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formata o CSV bruto de cobranças")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Processa o arquivo em blocos de N linhas (modo streaming)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processa partições do arquivo em N processos (modo paralelo)")
+    args = parser.parse_args()
+
     try:
-        df_final = processar_csv()
+        resultado = processar_csv(chunksize=args.chunksize, workers=args.workers)
         print("✅ CSV formatado criado com sucesso!")
-        print(df_final.head())
+        if isinstance(resultado, pd.DataFrame):
+            print(resultado.head())
+        else:
+            print(f"📊 Registros gravados: {resultado}")
     except FileNotFoundError as e:
         print(f"❌ Erro: {e}")
         print("📁 Verifique se o arquivo 'dados_cobranca.csv' existe")
     except Exception as e:
-        print(f"❌ Erro inesperado: {e}")
\ No newline at end of file
+        print(f"❌ Erro inesperado: {e}")
@@ -0,0 +1,24 @@
+import pytest
+
+from instrumentacao import PerfilExecucao, reiniciar_pico_rss
+
+MIB = 1024 * 1024
+
+
+@pytest.mark.skipif(not reiniciar_pico_rss(), reason="pico de memória residente só pode ser zerado no Linux")
+def test_pico_rss_por_etapa_sem_perfil():
+    perfil = PerfilExecucao('teste')
+    with perfil.etapa('externa'):
+        with perfil.etapa('grande'):
+            dados = bytearray(300 * MIB)
+            dados[::4096] = b'x' * len(dados[::4096])
+            del dados
+        with perfil.etapa('pequena'):
+            sum(range(1000))
+
+    etapas = perfil.relatorio(sucesso=True)['etapas']
+    # Cada etapa tem o próprio pico, não o acumulado do processo
+    assert etapas['pequena']['pico_rss_mb'] < etapas['grande']['pico_rss_mb'] - 200
+    # A etapa externa mantém o pico das internas, mesmo com o pico do processo zerado por elas
+    assert etapas['externa']['pico_rss_mb'] >= etapas['grande']['pico_rss_mb']
+    assert 'pico_tracemalloc_mb' not in etapas['grande']
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from processador_csv import processar_csv, _particionar
+
+HEADER = "C#EDOR,CAMPANHA,CLIENTE,DATA_CADASTRO,DATA_PAGAMENTO,STATUS_TITULO,VALOR"
+
+
+def _linha(rng):
+    campos = [
+        rng.choice(["Credor A", "credor b ", " CREDOR C", "Credor Ç"]),
+        rng.choice(["Campanha1", "campanha 2", "CAMPANHA3"]),
+        rng.choice(["Cliente1", "cliente 22", "ClienteX"]),
+        rng.choice(["2023-01-15", "15/02/2023", "Mar 3 2023", ""]),
+        rng.choice(["2023-02-01", "", "01/03/2023"]),
+        rng.choice(["Pago", " pago ", "paid", "Vencido", "overdue", "Pendente", ""]),
+        rng.choice(["1.000,00", "2,500.50", "300,00", "500", "", "null", "-1.200,50"]),
+    ]
+    # Delimitadores "," e ";" misturados
+    tipo = rng.random()
+    if tipo < 0.6:
+        return ",".join(campos)
+    if tipo < 0.8:
+        return ";".join(campos)
+    return "".join(c + (rng.choice(",;") if i < len(campos) - 1 else "") for i, c in enumerate(campos))
+
+
+def _gerar_csv(caminho, linhas, semente=7):
+    """CSV bruto com quebras de linha LF, CRLF e CR isolado misturadas, linhas vazias e truncadas"""
+    rng = random.Random(semente)
+    partes = [HEADER + "\r\n"]
+    for _ in range(linhas):
+        sorteio = rng.random()
+        linha = "" if sorteio < 0.01 else "Credor A,Campanha1" if sorteio < 0.02 else _linha(rng)
+        partes.append(linha + rng.choice(["\n", "\r\n", "\r"]))
+    caminho.write_bytes("".join(partes).encode("utf-8"))
+    return caminho
+
+
+@pytest.mark.parametrize("workers,chunksize", [(2, None), (3, 37), (4, 5)])
+def test_paralelo_igual_ao_processo_unico(tmp_path, workers, chunksize):
+    entrada = _gerar_csv(tmp_path / "dados_cobranca.csv", 600)
+
+    # Alguma fronteira de partição cai no meio de uma linha
+    conteudo = entrada.read_bytes()
+    partes = workers * 4
+    alvos = [len(conteudo) * k // partes for k in range(1, partes)]
+    assert any(conteudo[alvo - 1:alvo] not in (b"\n", b"\r") for alvo in alvos)
+    assert len(_particionar(entrada, partes)) > 1
+
+    unico = tmp_path / "unico.csv"
+    paralelo = tmp_path / "paralelo.csv"
+    processar_csv(input_path=entrada, output_path=unico)
+    processar_csv(chunksize=chunksize, input_path=entrada, output_path=paralelo, workers=workers)
+
+    assert paralelo.read_bytes() == unico.read_bytes()
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from valores import parse_valor_brasileiro, parse_valores, formatar_valores
+
+CASOS_PARSE = [
+    "1.200,50", "1.200", "1000,50", "2,500.50", "null", "NULL", "", "  ", np.nan, None,
+    "-1.200,50", "-300,00", "-2,500.50", "-1.200", "R$ 1.500,00", " 750 ", "500", "0,00",
+    "abc", "1.2.3", "12.34", "1,200", "1.200,50", "-0,00",
+]
+
+
+def _formatar_valor(x):
+    """Formatação escalar original do pré-processamento"""
+    return f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def test_parse_valores_igual_ao_escalar():
+    serie = pd.Series(CASOS_PARSE, dtype=object)
+    esperado = serie.apply(parse_valor_brasileiro)
+    resultado = parse_valores(serie)
+
+    assert resultado.index.equals(serie.index)
+    # Comparar os bits: distingue -0.0 de 0.0
+    assert resultado.to_numpy().view(np.int64).tolist() == esperado.to_numpy().view(np.int64).tolist()
+
+
+def test_formatar_valores_igual_ao_escalar():
+    serie = pd.Series([0.0, -0.0, 1200.5, -1200.5, 1234567.891, 0.005, 2500.5, 999.999, -0.004, 1e12])
+    esperado = serie.apply(_formatar_valor)
+    assert formatar_valores(serie).tolist() == esperado.tolist()
+
+
+def test_formatar_valores_inteiros():
+    serie = pd.Series([0, 1500, -2000, 1500])
+    assert formatar_valores(serie).tolist() == serie.apply(_formatar_valor).tolist()
+
+
+def test_ida_e_volta():
+    serie = pd.Series([0.0, 1200.5, -300.0, 2500.55, 1234567.89])
+    assert parse_valores(formatar_valores(serie)).tolist() == serie.tolist()
@@ -0,0 +1,101 @@
+import pandas as pd
+import numpy as np
+import re
+
+
+def parse_valor_brasileiro(valor_str):
+    """Converte valor no formato brasileiro para float"""
+    if pd.isna(valor_str) or str(valor_str).strip().lower() in ("", "null"):
+        return 0.0
+
+    valor_str = str(valor_str).strip()
+
+    # Remover símbolos e espaços
+    valor_str = re.sub(r'[^\d,.-]', '', valor_str)
+
+    # Caso: "1.200,50" -> "1200.50"
+    if '.' in valor_str and ',' in valor_str:
+        # Verificar se o ponto é separador de milhar
+        if valor_str.find('.') < valor_str.find(','):
+            valor_str = valor_str.replace('.', '').replace(',', '.')
+        else:
+            valor_str = valor_str.replace(',', '')
+    # Caso: "1.200" (milhar) -> "1200"
+    elif re.match(r'^\d+\.\d{3}$', valor_str):
+        valor_str = valor_str.replace('.', '')
+    # Caso: "1000,50" -> "1000.50"
+    elif ',' in valor_str:
+        valor_str = valor_str.replace(',', '.')
+
+    try:
+        return float(valor_str)
+    except ValueError:
+        return 0.0
+
+
+def _parse_valores_unicos(valores):
+    """Aplica as regras de `parse_valor_brasileiro` a uma Series de strings sem repetição"""
+    valores = valores.str.strip()
+    nulos = valores.str.lower().isin(["", "null"])
+
+    # Remover símbolos e espaços
+    valores = valores.str.replace(r'[^\d,.-]', '', regex=True)
+
+    tem_ponto = valores.str.contains('.', regex=False)
+    tem_virgula = valores.str.contains(',', regex=False)
+    ambos = tem_ponto & tem_virgula
+    ponto_antes = valores.str.find('.') < valores.str.find(',')
+    milhar = ~ambos & valores.str.fullmatch(r'\d+\.\d{3}')
+
+    normalizados = valores.copy()
+
+    # Caso: "1.200,50" -> "1200.50"
+    mask = ambos & ponto_antes
+    normalizados[mask] = valores[mask].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    # Caso: "1,200.50" -> "1200.50"
+    mask = ambos & ~ponto_antes
+    normalizados[mask] = valores[mask].str.replace(',', '', regex=False)
+    # Caso: "1.200" (milhar) -> "1200"
+    normalizados[milhar] = valores[milhar].str.replace('.', '', regex=False)
+    # Caso: "1000,50" -> "1000.50"
+    mask = ~ambos & ~milhar & tem_virgula
+    normalizados[mask] = valores[mask].str.replace(',', '.', regex=False)
+
+    resultado = pd.to_numeric(normalizados, errors='coerce').astype(float)
+    resultado[nulos] = 0.0
+    return resultado.fillna(0.0).to_numpy()
+
+
+def parse_valores(serie):
+    """
+    Converte uma coluna VALOR inteira do formato brasileiro para float.
+
+    Equivalente a `serie.apply(parse_valor_brasileiro)`, mas opera sobre a coluna de uma vez:
+    os valores distintos são normalizados com operações de string do pandas e o resultado é
+    redistribuído pelos códigos do `pd.factorize`.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+
+    convertidos = np.zeros(len(unicos) + 1, dtype=float)
+    if len(unicos):
+        convertidos[:-1] = _parse_valores_unicos(pd.Series(unicos, dtype=object).astype(str))
+
+    # Código -1 (NaN) aponta para a última posição, que vale 0.0
+    return pd.Series(convertidos[codigos], index=serie.index, name=serie.name)
+
+
+def formatar_valores(serie):
+    """Formata uma coluna numérica no estilo brasileiro ("1.000,00")"""
+    valores = serie.to_numpy()
+    if valores.dtype.kind == 'f':
+        # Fatorar pelos bits para não confundir -0.0 com 0.0 ("-0,00" vs "0,00")
+        codigos, bits = pd.factorize(valores.astype(np.float64).view(np.int64))
+        unicos = bits.view(np.float64)
+    else:
+        codigos, unicos = pd.factorize(valores, use_na_sentinel=False)
+
+    formatados = np.array(
+        [f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for x in unicos],
+        dtype=object
+    )
+    return pd.Series(formatados[codigos], index=serie.index, name=serie.name, dtype=object)
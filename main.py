@@ -3,16 +3,21 @@
 Script principal para executar o pipeline completo de ETL
 """
 
+import argparse
 import subprocess
 import sys
 from pathlib import Path
 
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
 
 def run_script(script_path):
     """Executa um script Python"""
     try:
-        result = subprocess.run([sys.executable, script_path],
-                                capture_output=True, text=True)
+        # Os scripts usam caminhos relativos à pasta data/
+        result = subprocess.run([sys.executable, Path(script_path).name],
+                                capture_output=True, text=True,
+                                cwd=Path(script_path).parent)
         if result.returncode == 0:
             print(f"✓ {script_path} executado com sucesso")
             return True
@@ -25,12 +30,66 @@ def run_script(script_path):
         return False
 
 
+def run_pipeline(chunksize=None, csv_formatado=False, perfil=False):
+    """
+    Executa pré-processamento e ETL no mesmo processo: os DataFrames tipados do
+    processador seguem direto para o ETLProcessor, sem gravar e reler o CSV formatado.
+    """
+    sys.path.insert(0, str(DATA_DIR))
+    from processador_csv import iterar_blocos_limpos
+    from etl import ETLProcessor
+
+    etl = ETLProcessor(
+        input_file=str(DATA_DIR / "dados_cobranca_formatado.csv"),
+        output_db=str(DATA_DIR / "resumo.bd"),
+        output_csv=str(DATA_DIR / "resumo_mensal.csv"),
+        output_parquet=str(DATA_DIR / "parquet"),
+        output_relatorio=str(DATA_DIR / "etl_execucao.json"),
+    )
+
+    try:
+        blocos = iterar_blocos_limpos(
+            chunksize=chunksize,
+            input_path=DATA_DIR / "dados_cobranca.csv",
+            output_path=etl.input_file if csv_formatado else None,
+        )
+        return etl.run_etl(blocos=blocos, perfil=perfil) is not None
+    except FileNotFoundError as e:
+        print(f"✗ Erro: {e}")
+        return False
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Executa o pipeline completo de ETL")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Executa pré-processamento e ETL no mesmo processo")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Com --pipeline, processa o CSV bruto em blocos de N linhas")
+    parser.add_argument("--csv-formatado", action="store_true",
+                        help="Com --pipeline, grava também data/dados_cobranca_formatado.csv")
+    parser.add_argument("--perfil", action="store_true",
+                        help="Com --pipeline, executa o ETL sob cProfile e tracemalloc")
+    args = parser.parse_args()
+
     print("Iniciando pipeline ETL...")
 
+    if args.pipeline:
+        print("\nProcessando CSV original e executando ETL no mesmo processo...")
+        if run_pipeline(args.chunksize, args.csv_formatado, args.perfil):
+            print("\n✓ Pipeline concluído com sucesso!")
+            print("Arquivos gerados:")
+            if args.csv_formatado:
+                print("  - data/dados_cobranca_formatado.csv")
+            print("  - data/resumo_mensal.csv")
+            print("  - data/resumo.bd (SQLite)")
+            print("  - data/parquet/ (Parquet particionado por MES_ANO)")
+        else:
+            print("\n✗ Pipeline falhou.")
+        return
+
     # 1. Primeiro processar o CSV original
     print("\n1. Processando CSV original...")
-    processador_path = Path("data/processador_csv.py")
+    processador_path = DATA_DIR / "processador_csv.py"
 
     if processador_path.exists():
         success = run_script(str(processador_path))
@@ -42,7 +101,7 @@ def main():
 
     # 2. Executar ETL
     print("\n2. Executando ETL...")
-    etl_path = Path("data/etl.py")
+    etl_path = DATA_DIR / "etl.py"
     success = run_script(str(etl_path))
 
     if success:
@@ -51,9 +110,10 @@ def main():
         print("  - data/dados_cobranca_formatado.csv")
         print("  - data/resumo_mensal.csv")
         print("  - data/resumo.bd (SQLite)")
+        print("  - data/parquet/ (Parquet particionado por MES_ANO)")
     else:
         print("\n✗ Pipeline falhou.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,7 +3,9 @@ import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from cachetools import TTLCache
 from datetime import datetime
+import threading
 
 # Configuração da página
 st.set_page_config(
@@ -16,27 +18,71 @@ st.set_page_config(
 # URL base da API
 API_BASE_URL = "http://localhost:8000"
 
+# Credores mostrados nos gráficos por credor; os demais são somados em "Outros"
+TOP_CREDORES = 15
+
+# Respostas guardadas para revalidação com If-None-Match (entradas e segundos)
+RESPOSTAS_MAXIMO = 256
+RESPOSTAS_TTL = 3600
+
+
+@st.cache_resource
+def _sessao_http():
+    """Sessão HTTP compartilhada entre execuções (reaproveita a conexão TCP com a API)"""
+    return requests.Session()
+
+
+@st.cache_resource
+def _respostas_validadas():
+    """
+    Última resposta (ETag, JSON) por requisição, para revalidar com If-None-Match. Limitada em
+    tamanho e idade (LRU + TTL) e protegida por lock: é compartilhada pelas sessões do servidor.
+    """
+    return TTLCache(maxsize=RESPOSTAS_MAXIMO, ttl=RESPOSTAS_TTL), threading.Lock()
+
 
 @st.cache_data(ttl=300)
 def fetch_data(endpoint, params=None):
-    """Busca dados da API"""
+    """Busca dados da API (requisição condicional: 304 reaproveita a resposta anterior)"""
+    chave = (endpoint, tuple(sorted((params or {}).items())))
+    anteriores, lock = _respostas_validadas()
+    with lock:
+        anterior = anteriores.get(chave)
+    headers = {}
+    if anterior is not None:
+        headers["If-None-Match"] = anterior[0]
+
     try:
-        response = requests.get(f"{API_BASE_URL}{endpoint}", params=params)
+        response = _sessao_http().get(f"{API_BASE_URL}{endpoint}", params=params, headers=headers)
+        if response.status_code == 304 and anterior is not None:
+            return anterior[1]
         response.raise_for_status()
-        return response.json()
+        dados = response.json()
+        if "ETag" in response.headers:
+            with lock:
+                anteriores[chave] = (response.headers["ETag"], dados)
+        return dados
     except requests.exceptions.RequestException:
         return None
 
 
-def create_monthly_evolution_chart(df):
-    """Cria gráfico de evolução mensal dos valores totais"""
-    if df.empty:
+def fetch_export(params):
+    """Exportação completa em CSV (sem o limite de página), lida da API em partes"""
+    try:
+        with _sessao_http().get(f"{API_BASE_URL}/resumo/export", params={**params, "formato": "csv"},
+                                stream=True) as response:
+            response.raise_for_status()
+            return b"".join(response.iter_content(chunk_size=1 << 16))
+    except requests.exceptions.RequestException:
+        return None
+
+
+def create_monthly_evolution_chart(monthly_data):
+    """Cria gráfico de evolução mensal dos valores totais (série por_mes da API)"""
+    if monthly_data.empty:
         return None
 
-    monthly_data = df.groupby('mes_ano').agg({
-        'valor_total': 'sum',
-        'quantidade': 'sum'
-    }).reset_index().sort_values('mes_ano')
+    monthly_data = monthly_data.sort_values('mes_ano')
 
     fig = px.line(
         monthly_data,
@@ -75,15 +121,12 @@ def create_monthly_evolution_chart(df):
     return fig
 
 
-def create_credor_comparison_chart(df):
-    """Cria gráfico comparativo de valores por CREDOR"""
-    if df.empty:
+def create_credor_comparison_chart(credor_data):
+    """Cria gráfico comparativo de valores por CREDOR (série por_credor da API)"""
+    if credor_data.empty:
         return None
 
-    credor_data = df.groupby('credor').agg({
-        'valor_total': 'sum',
-        'quantidade': 'sum'
-    }).reset_index().sort_values('valor_total', ascending=False)
+    credor_data = credor_data.sort_values('valor_total', ascending=False)
 
     fig = px.bar(
         credor_data,
@@ -104,13 +147,11 @@ def create_credor_comparison_chart(df):
     return fig
 
 
-def create_credor_pie_chart(df):
-    """Cria gráfico de pizza com distribuição por credor"""
-    if df.empty:
+def create_credor_pie_chart(credor_data):
+    """Cria gráfico de pizza com distribuição por credor (série por_credor da API)"""
+    if credor_data.empty:
         return None
 
-    credor_data = df.groupby('credor')['valor_total'].sum().reset_index()
-
     fig = px.pie(
         credor_data,
         values='valor_total',
@@ -137,76 +178,75 @@ def main():
     # Sidebar com filtros
     st.sidebar.header("🔍 Filtros Interativos")
 
-    # Buscar opções disponíveis da API
-    meses_data = fetch_data("/resumo/meses") or {"meses": []}
-    credores_data = fetch_data("/resumo/credores") or {"credores": []}
+    # Filtros atuais (estado dos widgets da execução anterior), para a chamada única à API
+    params = {}
+    if st.session_state.get("filtro_mes", "Todos") != "Todos":
+        params["mes_ano"] = st.session_state["filtro_mes"]
+    if st.session_state.get("filtro_credor", "Todos") != "Todos":
+        params["credor"] = st.session_state["filtro_credor"]
+    if st.session_state.get("filtro_status", "Todos") != "Todos":
+        params["status"] = st.session_state["filtro_status"]
+
+    # Buscar opções dos filtros, resumo, totais, séries e health numa única requisição
+    painel = fetch_data("/dashboard", params={**params, "top": TOP_CREDORES})
+
+    if not painel:
+        st.error("❌ Não foi possível conectar à API. Verifique se a API está rodando em http://localhost:8000")
+        st.info("💡 Execute: `python run_api.py` para iniciar a API")
+        return
 
     # Filtros interativos
-    selected_mes = st.sidebar.selectbox(
+    st.sidebar.selectbox(
         "Filtrar por Mês:",
-        options=["Todos"] + meses_data["meses"],
-        index=0
+        options=["Todos"] + painel["filtros"]["meses"],
+        key="filtro_mes"
     )
 
-    selected_credor = st.sidebar.selectbox(
+    st.sidebar.selectbox(
         "Filtrar por Credor:",
-        options=["Todos"] + credores_data["credores"],
-        index=0
+        options=["Todos"] + painel["filtros"]["credores"],
+        key="filtro_credor"
     )
 
-    selected_status = st.sidebar.selectbox(
+    st.sidebar.selectbox(
         "Filtrar por Status:",
-        options=["Todos", "Pago", "Pendente", "Vencido"],
-        index=0
+        options=["Todos"] + painel["filtros"]["status"],
+        key="filtro_status"
     )
 
-    # Aplicar filtros
-    params = {}
-    if selected_mes != "Todos":
-        params["mes_ano"] = selected_mes
-    if selected_credor != "Todos":
-        params["credor"] = selected_credor
-    if selected_status != "Todos":
-        params["status"] = selected_status
-
-    # Buscar dados da API
-    resumo_data = fetch_data("/resumo", params=params)
-
-    if not resumo_data:
-        st.error("❌ Não foi possível conectar à API. Verifique se a API está rodando em http://localhost:8000")
-        st.info("💡 Execute: `python run_api.py` para iniciar a API")
-        return
-
+    resumo_data = painel["resumo"]
     df = pd.DataFrame(resumo_data["data"])
 
     if df.empty:
         st.warning("⚠️ Nenhum dado encontrado com os filtros selecionados")
         return
 
-    # Métricas principais
+    # Métricas principais (sobre todas as linhas filtradas, não só a página)
     st.header("📈 Métricas Principais")
 
     col1, col2, col3, col4 = st.columns(4)
 
-    total_valor = df['valor_total'].sum()
-    total_registros = df['quantidade'].sum()
-    avg_valor = df['valor_total'].sum() / df['quantidade'].sum() if df['quantidade'].sum() > 0 else 0
-    unique_credores = df['credor'].nunique()
+    totais = painel["totais"]
 
     with col1:
-        st.metric("Valor Total", f"R$ {total_valor:,.2f}")
+        st.metric("Valor Total", f"R$ {totais['valor_total']:,.2f}")
     with col2:
-        st.metric("Total de Registros", f"{total_registros:,}")
+        st.metric("Total de Registros", f"{totais['quantidade']:,}")
     with col3:
-        st.metric("Valor Médio", f"R$ {avg_valor:,.2f}")
+        st.metric("Valor Médio", f"R$ {totais['valor_medio']:,.2f}")
     with col4:
-        st.metric("Credores Únicos", unique_credores)
+        st.metric("Credores Únicos", totais['credores_unicos'])
+
+    monthly_data = pd.DataFrame(painel["series"]["por_mes"], columns=["mes_ano", "valor_total", "quantidade"])
+    credor_data = pd.DataFrame(
+        painel["series"]["por_credor"], columns=["credor", "valor_total", "quantidade", "participacao"]
+    )
 
     st.markdown("---")
 
     # GRÁFICO 1: Evolução Mensal dos Valores Totais (Linha)
     st.header("📈 Evolução Mensal dos Valores Totais")
-    fig_evolution = create_monthly_evolution_chart(df)
+    fig_evolution = create_monthly_evolution_chart(monthly_data)
     if fig_evolution:
         st.plotly_chart(fig_evolution, use_container_width=True)
     else:
@@ -220,14 +260,14 @@ def main():
     col1, col2 = st.columns([2, 1])
 
     with col1:
-        fig_comparison = create_credor_comparison_chart(df)
+        fig_comparison = create_credor_comparison_chart(credor_data)
         if fig_comparison:
             st.plotly_chart(fig_comparison, use_container_width=True)
         else:
             st.info("Não há dados suficientes para comparação por credor")
 
     with col2:
-        fig_pie = create_credor_pie_chart(df)
+        fig_pie = create_credor_pie_chart(credor_data)
         if fig_pie:
             st.plotly_chart(fig_pie, use_container_width=True)
         else:
@@ -294,21 +334,27 @@ def main():
         st.caption(f"Mostrando {min(show_rows, len(df_sorted))} de {len(df_sorted)} registros")
 
     with col2:
-        csv = df_sorted.to_csv(index=False)
-        st.download_button(
-            label="📥 Exportar para CSV",
-            data=csv,
-            file_name=f"resumo_cobrancas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv",
-            use_container_width=True
-        )
+        # Exportação completa gerada pela API e entregue pelo próprio Streamlit: API_BASE_URL é o
+        # endereço da API para o servidor do dashboard, não necessariamente para o navegador
+        if st.button("📥 Exportar para CSV", use_container_width=True):
+            exportacao = fetch_export(params)
+            if exportacao is None:
+                st.error("❌ Não foi possível gerar a exportação")
+            else:
+                st.download_button(
+                    label="💾 Baixar CSV",
+                    data=exportacao,
+                    file_name=f"resumo_cobrancas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
 
     # Informações do sistema
     with st.sidebar:
         st.markdown("---")
         st.subheader("ℹ️ Informações do Sistema")
 
-        health_data = fetch_data("/health")
+        health_data = painel["health"]
         if health_data:
             status_color = "🟢" if health_data['status'] == "OK" else "🔴"
             st.write(f"{status_color} **Status API:** {health_data['status']}")
@@ -317,7 +363,7 @@ def main():
 
         st.markdown("---")
         st.caption(f"Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        st.caption(f"Total de registros: {len(df)}")
+        st.caption(f"Total de registros: {resumo_data['total']}")
 
 
 if __name__ == "__main__":